@@ -1,42 +1,99 @@
-import psycopg2
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-from neo4j import GraphDatabase
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font
 
-from config import load_config
-from logger import get_logger
+from app_inventory import ApplicationInventory
+from bulk_collection import SCHEMA_QUERIES, collect_bulk
+from config import LazyConfig
+from journal import RunJournal
+from logger import configure_logging, dropped_records, get_logger, log_summary
+from metric_records import (
+    REPORT_COLUMNS, TECH_COLUMNS, TECH_SHEET, OBJECT_TYPE_COLUMNS, OBJECT_TYPE_SHEET,
+    UNMATCHED_SHEET, WORKBOOK_IO, MetricTable, join_v3, unmatched_rows
+)
+from neo4j_counts import (
+    COUNT_MODES, fetch_neo4j_object_counts, fetch_neo4j_object_counts_async,
+    fetch_neo4j_histograms, fetch_neo4j_histograms_async, histogram_object_totals,
+    diff_neo4j_object_sets
+)
+from pipeline import PipelineStats, pipelined
+from profiler import profiler
+from query_audit import audit_queries, load_query_variants, needs_snapshots, render_query, write_audit
+from snapshot_store import SnapshotStore
 from Queries import (
     loc, loc_per_tech, dlms,
     extension_count, missing_code_db,
     analyzed_files, critical_violations,
-    missing_code, check_schemas,
-    loc_null, customized_jobs,
-    fetch_app_schema
+    missing_code, loc_null,
+    customized_jobs, latest_snapshot,
+    schema_sizes
 )
 
 # ------------------ LOGGER ------------------
 logger = get_logger(__name__)
 
 # ------------------ LOAD CONFIG ------------------
-logger.info("Loading configuration")
-config = load_config()
+def _configure(section):
+    logger.info("Loading configuration")
+    configure_logging(
+        asynchronous=section.get("LOG_MODE", "async").strip().lower() == "async",
+        queue_size=section.getint("LOG_QUEUE_SIZE", 10000),
+        max_length=section.getint("LOG_MAX_MESSAGE_LENGTH", 2000),
+        rate=section.getint("LOG_RATE_LIMIT", 500),
+    )
+    profiler.enabled = section.getboolean("PROFILE_QUERIES", False)
+
+
+# Read on first use: importing this module opens no file and no connection
+config = LazyConfig(on_load=_configure)
 
 # ------------------ POSTGRES CONNECTION ------------------
+# psycopg2 and the neo4j driver are imported by the functions that connect, so
+# commands that never connect (variation, merge) do not load them
+def _postgres_params():
+    params = dict(
+        host=config['CSS_HOST'],
+        port=config['CSS_PORT'],
+        dbname=config['CSS_DB'],
+        user=config['CSS_USERNAME'],
+        password=config['CSS_PASSWORD']
+    )
+    if profiler.enabled:
+        from profiling_cursor import ProfilingCursor
+        params["cursor_factory"] = ProfilingCursor
+    return params
+
+
 def postgres_connection():
+    import psycopg2
+
     try:
         logger.info("Connecting to PostgreSQL")
-        return psycopg2.connect(
-            host=config['CSS_HOST'],
-            port=config['CSS_PORT'],
-            dbname=config['CSS_DB'],
-            user=config['CSS_USERNAME'],
-            password=config['CSS_PASSWORD']
-        )
+        return psycopg2.connect(**_postgres_params())
     except Exception:
         logger.exception("PostgreSQL connection failed")
         raise
 
+
+def postgres_pool(size):
+    import psycopg2.pool
+
+    try:
+        logger.info(f"Creating PostgreSQL connection pool (max {size} connections)")
+        return psycopg2.pool.ThreadedConnectionPool(1, size, **_postgres_params())
+    except Exception:
+        logger.exception("PostgreSQL connection pool creation failed")
+        raise
+
 # ------------------ NEO4J CONNECTION ------------------
 def neo4j_connection(uri, username, password):
+    from neo4j import GraphDatabase
+
     try:
         logger.info("Connecting to Neo4j")
         return GraphDatabase.driver(uri, auth=(username, password))
@@ -44,244 +101,649 @@ def neo4j_connection(uri, username, password):
         logger.exception("Neo4j connection failed")
         raise
 
-# ------------------ FETCH NEO4J OBJECT COUNTS ------------------
-def fetch_neo4j_object_counts(driver, database_names):
-    logger.info("Fetching Neo4j object counts")
-    app_object_counts = {}
 
-    for db in database_names:
-        logger.info(f"[Neo4j DB={db}] Processing")
+def neo4j_async_connection(uri, username, password):
+    from neo4j import AsyncGraphDatabase
+
+    try:
+        logger.info(f"Connecting to Neo4j (async) at {uri}")
+        return AsyncGraphDatabase.driver(uri, auth=(username, password))
+    except Exception:
+        logger.exception("Neo4j connection failed")
+        raise
 
-        with driver.session(database=db) as session:
-            apps = session.run("""
-                MATCH(n:Application)
-RETURN n.DisplayName as consoleApp_name ,n.Name as app_name
-            """)
+# ------------------ APPLICATION INVENTORY ------------------
+def application_inventory(cursor, run=None):
+    """The CSS applications, read once per run.
 
-            for record in apps:
-                app_name = record["app_name"]
-                capp_name=record["consoleApp_name"]
-                if not app_name:
-                    continue
+    Both passes of a run, and their Neo4j name matching, share the RunState's
+    inventory; without a run it is read again, so applications and schemas
+    added to the CSS since an earlier run are seen.
+    """
+    if run is None:
+        return ApplicationInventory.load(cursor)
+    if run.inventory is None:
+        run.inventory = ApplicationInventory.load(cursor)
+    return run.inventory
+
+# ------------------ COLLECT APPLICATION METRICS ------------------
+class RunState:
+    """What the V2 and V3 passes of one run share.
+
+    Menu option 4, `cli.py all` and shard runs hand the same RunState to both
+    of their passes and set both_passes. Any other pass starts from a new one,
+    so nothing an earlier run of the same process collected is reused.
+    """
 
-                query = f"""
-                MATCH (o:Object:`{app_name}`)
-                WHERE NOT 'Deleted' IN labels(o)
-                RETURN count(o) AS cnt
-                """
+    def __init__(self, both_passes=False):
+        # Whether the other environment's pass follows with this RunState:
+        # only then are its Neo4j results worth fetching ahead
+        self.both_passes = both_passes
+        # PostgreSQL metrics per task (see shared_postgres_metrics)
+        self.postgres_metrics = {}
+        # Neo4j results fetched for the other environment by an async pass,
+        # used once by that environment's pass
+        self.neo4j_counts = {}
+        self.neo4j_histograms = {}
+        # ApplicationInventory, read by the first pass (see application_inventory)
+        self.inventory = None
+
+
+class SchemaQueryCache:
+    """Per-run results of application-independent queries, keyed by (schema, query name).
+
+    Every query except `loc` depends only on the search_path, so applications
+    sharing a schema triplet only pay for them once. `queries` replaces
+    Queries.py statements by name with the variants picked by the query audit.
+    """
 
-                result = session.run(query).single()
-                count = result["cnt"] if result else 0
-                app_object_counts[capp_name] = (
-                    app_object_counts.get(capp_name, 0) + count
-                )
+    def __init__(self, queries=None):
+        self.hits = 0
+        self.misses = 0
+        self.queries = queries or {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _cached(self, key, compute):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Concurrent workers on the same schema wait for the first one's result
+        with key_lock:
+            if key in self._results:
+                with self._lock:
+                    self.hits += 1
+                return self._results[key]
+
+            rows = compute()
+            self._results[key] = rows
+            with self._lock:
+                self.misses += 1
+            return rows
+
+    def snapshots(self, cursor, prefix):
+        def compute():
+            cursor.execute(latest_snapshot.format(schema=prefix))
+            return cursor.fetchone()
+
+        return self._cached((prefix, "latest_snapshot"), compute)
+
+    def fetch(self, cursor, schema, name, query):
+        query = self.queries.get(name, query)
+
+        def compute():
+            text = query
+            if needs_snapshots(text):
+                text = render_query(text, self.snapshots(cursor, schema.rsplit("_", 1)[0]))
+            cursor.execute(f"SET search_path TO {schema}; {text}")
+            return cursor.fetchall()
+
+        return self._cached((schema, name), compute)
+
+
+def collect_app_metrics(cursor, app_name, schema, app_domain_guid, cache=None):
+    if cache is None:
+        cache = SchemaQueryCache()
+
+    # -------- CENTRAL --------
+    loc_query = loc_null if app_domain_guid is None else loc
+    if app_domain_guid is None:
+        cursor.execute(loc_query, (app_name,))
+    else:
+        cursor.execute(loc_query, (app_domain_guid, app_name))
+
+    loc_rows = cursor.fetchall()
+
+    central = f"{schema}_central"
+    loc_per_tech_rows = cache.fetch(cursor, central, "loc_per_tech", loc_per_tech)
+    extension_count_rows = cache.fetch(cursor, central, "extension_count", extension_count)
+    critical_violations_rows = cache.fetch(cursor, central, "critical_violations", critical_violations)
+
+    # -------- LOCAL --------
+    local = f"{schema}_local"
+    dlms_rows = cache.fetch(cursor, local, "dlms", dlms)
+    missing_code_db_rows = cache.fetch(cursor, local, "missing_code_db", missing_code_db)
+    analyzed_files_rows = cache.fetch(cursor, local, "analyzed_files", analyzed_files)
+    missing_codes = cache.fetch(cursor, local, "missing_code", missing_code)
+
+    # -------- MNGT --------
+    customized_jobs_rows = cache.fetch(cursor, f"{schema}_mngt", "customized_jobs", customized_jobs)
+
+    return {
+        "loc": loc_rows,
+        "loc_per_tech": loc_per_tech_rows,
+        "extension_count": extension_count_rows,
+        "critical_violations": critical_violations_rows,
+        "dlms": dlms_rows,
+        "missing_code_db": missing_code_db_rows,
+        "analyzed_files": analyzed_files_rows,
+        "missing_code": missing_codes,
+        "customized_jobs": customized_jobs_rows
+    }
+
+
+def _release_failed(pool, connection, context):
+    """Return a connection after a failed query.
+
+    The aborted transaction is rolled back so the pooled connection stays
+    usable; a connection that dropped cannot be rolled back and is closed
+    instead, so the pool opens a fresh one for the next application.
+    """
+    try:
+        connection.rollback()
+    except Exception as exc:
+        logger.warning(f"{context} Discarding broken PostgreSQL connection: {exc}")
+        pool.putconn(connection, close=True)
+    else:
+        pool.putconn(connection)
 
-    logger.info("Neo4j object count collection completed")
-    return app_object_counts
 
-# ------------------ VALUE EXTRACTION ------------------
-def extract_v2(param, value):
-    if not value:
-        return 0
+def _collect_pooled(pool, cache, task):
+    sheet, app_name, schema, app_domain_guid = task
+    context = f"[Domain={sheet} | App={app_name} | Schema={schema}]"
+    logger.info(f"{context} Starting application processing")
 
-    if param == "loc":
-        return value[0][0]
+    try:
+        connection = pool.getconn()
+    except Exception:
+        logger.exception(f"{context} ERROR getting a PostgreSQL connection")
+        return None
 
-    if param == "loc_per_tech":
-        return ", ".join(f"{tech}:{int(loc)}" for tech, loc in value)
+    try:
+        with connection.cursor() as cursor, profiler.app(app_name):
+            metrics = collect_app_metrics(cursor, app_name, schema, app_domain_guid, cache)
+    except Exception:
+        logger.exception(f"{context} ERROR during processing")
+        _release_failed(pool, connection, context)
+        return None
 
-    if param in (
-        "extension_count", "dlms",
-        "analyzed_files", "Total Object Count",
-        "Customized Jobs"
-    ):
-        return value[0][0]
+    pool.putconn(connection)
+    return metrics
 
-    if param in ("missing_code_db", "Missing Code"):
-        return value[0][0]
 
-    if param == "Dashboard - Critical violations":
-        return value[0][2]
+def _collect_bulk_pooled(pool, cache, existing_schemas, batch):
+    context = f"[Domain={batch[0][0]} | Bulk batch of {len(batch)}]"
+    try:
+        connection = pool.getconn()
+    except Exception:
+        logger.exception(f"{context} ERROR getting a PostgreSQL connection")
+        connection = None
 
-    return 0
+    if connection is not None:
+        try:
+            with connection.cursor() as cursor, profiler.app(f"bulk batch of {len(batch)} ({batch[0][0]})"):
+                results = collect_bulk(cursor, batch, existing_schemas, cache.queries)
+        except Exception:
+            logger.exception(
+                f"Bulk collection failed for {len(batch)} applications, falling back to per-application queries"
+            )
+            _release_failed(pool, connection, context)
+        else:
+            pool.putconn(connection)
+            return results
 
-# ------------------ BUILD EXCEL ROWS ------------------
-def build_excel_rows(all_data):
-    rows = []
-    app_name = all_data["app_name"]
-    first = True
+    # Isolate the failing application(s) the way the per-application engine does
+    return {task: _collect_pooled(pool, cache, task) for task in batch}
 
-    for key, value in all_data.items():
-        if key in ("domain_name", "app_name"):
-            continue
 
-        rows.append({
-            "App Name": app_name if first else "",
-            "Parameters": key.replace("_", " ").title(),
-            "V2": extract_v2(key, value),
-            "V3": "",
-            "Variation": ""
-        })
-        first = False
-
-    return rows
-def build_excel_rows_v3(all_data):
-    rows = []
-    app_name = all_data["app_name"]
-    first = True
-
-    for key, value in all_data.items():
-        if key in ("domain_name", "app_name"):
-            continue
+def _bulk_batches(tasks, batch_size):
+    by_domain = {}
+    for task in tasks:
+        by_domain.setdefault(task[0], []).append(task)
 
-        rows.append({
-            "App Name": app_name if first else "",
-            "Parameters": key.replace("_", " ").title(),
-            "V2":"",
-            "V3":extract_v2(key, value),
-            "Variation": ""
-        })
-        first = False
+    for domain_tasks in by_domain.values():
+        for start in range(0, len(domain_tasks), batch_size):
+            yield domain_tasks[start:start + batch_size]
 
-    return rows
-# ------------------ MAIN REPORT ------------------
-def generate_report():
-    logger.info("V3 Upgrade Validation started")
 
-    connection = postgres_connection()
-    cursor = connection.cursor()
+def collect_applications(inventory, jobs, reuse=None):
+    """Collect every inventory task on a pool of `jobs` workers, yielding (task, metrics) in task order.
 
-    neo4j_driver = neo4j_connection(
-        config['NEO4J_URL'],
-        config['NEO4J_USER'],
-        config['NEO4J_PASSWORD']
-    )
+    metrics is None for applications that failed or miss one of their three
+    schemas; the reason is already logged. Tasks found in `reuse` are served
+    from it without touching PostgreSQL, and freshly collected metrics are
+    added to it. With COLLECTION_MODE=bulk each worker collects a batch of up
+    to BULK_BATCH_SIZE applications of one domain in a single cross-schema
+    statement instead of one application at a time.
+    """
+    tasks = inventory.tasks
+    reuse = {} if reuse is None else reuse
+    pending = [task for task in tasks if task not in reuse]
+    if len(pending) < len(tasks):
+        logger.info(
+            f"Reusing PostgreSQL metrics for {len(tasks) - len(pending)} of {len(tasks)} applications"
+        )
+
+    runnable = []
+    for task in pending:
+        missing = inventory.missing_schemas(task)
+        if missing:
+            sheet, app_name, schema, _ = task
+            logger.warning(
+                f"[Domain={sheet} | App={app_name} | Schema={schema}] Skipping, missing schemas: {', '.join(missing)}"
+            )
+        else:
+            runnable.append(task)
+    pending = runnable
+
+    if not pending:
+        for task in tasks:
+            yield task, reuse.get(task)
+        return
+
+    jobs = max(1, jobs)
+    pool = postgres_pool(jobs)
+    cache = SchemaQueryCache(load_query_variants(config.get("QUERY_VARIANTS_FILE", "query_variants.json")))
+    bulk = config.get("COLLECTION_MODE", "per_app").strip().lower() == "bulk"
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            if bulk:
+                units = list(_bulk_batches(pending, max(1, config.getint("BULK_BATCH_SIZE", 50))))
 
-    tenants = config["NEO4J_DB"].split(',')
-    neo4j_object_counts = fetch_neo4j_object_counts(
-        neo4j_driver, tenants
+                def submit(batch):
+                    return executor.submit(_collect_bulk_pooled, pool, cache, inventory.schemas, batch)
+            else:
+                units = [[task] for task in pending]
+
+                def submit(unit):
+                    return executor.submit(_collect_pooled, pool, cache, unit[0])
+
+            unit_of = {task: idx for idx, unit in enumerate(units) for task in unit}
+            remaining = [len(unit) for unit in units]
+            futures = {}
+            # Work is submitted a bounded window ahead of the task being yielded,
+            # so a slow consumer cannot pile up finished results without limit
+            window = jobs * 2
+            submitted = 0
+
+            for task in tasks:
+                if task not in unit_of:
+                    # Reused, or skipped for missing schemas
+                    yield task, reuse.get(task)
+                    continue
+
+                idx = unit_of[task]
+                while submitted < len(units) and submitted <= idx + window:
+                    futures[submitted] = submit(units[submitted])
+                    submitted += 1
+
+                metrics = futures[idx].result()
+                if bulk:
+                    metrics = metrics[task]
+                remaining[idx] -= 1
+                if not remaining[idx]:
+                    del futures[idx]
+
+                if metrics is not None:
+                    reuse[task] = metrics
+                yield task, metrics
+    finally:
+        pool.closeall()
+        logger.info(
+            f"Schema query cache: {cache.hits} hit(s), {cache.misses} miss(es)"
+        )
+
+
+def shared_postgres_metrics(run):
+    # Same CSS queries back both passes, so one pass of a run can serve the other
+    if config.getboolean("SHARE_POSTGRES_METRICS", True):
+        return run.postgres_metrics
+    return None
+
+# ------------------ V3 MERGE ------------------
+def report_unmatched(table, v2_only, v3_table, v3_only):
+    """Log keys found on one side only and list them on the Unmatched Keys sheet."""
+    table.extra_sheets.pop(UNMATCHED_SHEET, None)
+    if not v2_only and not v3_only:
+        logger.info("V3 merge: every (sheet, app, parameter) key matched")
+        return
+
+    for label, names in (
+        ("V2", {(table.sheets[i], table.apps[i]) for i in v2_only}),
+        ("V3", {(v3_table.sheets[i], v3_table.apps[i]) for i in v3_only}),
+    ):
+        for sheet, app_name in sorted(names, key=str):
+            logger.warning(f"[Domain={sheet} | App={app_name}] Keys found in {label} only")
+
+    logger.warning(
+        f"V3 merge: {len(v2_only)} key(s) in V2 only, {len(v3_only)} key(s) in V3 only, "
+        f"listed on sheet '{UNMATCHED_SHEET}'"
     )
-    cursor.execute(
-        "SELECT guid, name FROM aip_node.domain ORDER BY guid ASC"
+    table.extra_sheets[UNMATCHED_SHEET] = unmatched_rows(table, v2_only, v3_table, v3_only)
+
+# ------------------ SNAPSHOT STORE ------------------
+def open_snapshot_store():
+    path = config.get("SNAPSHOT_STORE", "").strip()
+    return SnapshotStore(path) if path else None
+
+
+def shard_path(index, count):
+    return config.get("SHARD_FILE", "validation_shard_{index}_of_{count}.jsonl").format(index=index, count=count)
+
+
+def open_journal():
+    path = config.get("JOURNAL_FILE", "").strip()
+    return RunJournal(path) if path else None
+
+
+def fetch_snapshot_ids(cursor, tasks):
+    """Return {task: "adg_snapshot:dss_snapshot"}; None when the schema cannot be read."""
+    snapshot_ids = {}
+
+    for task in tasks:
+        sheet, app_name, schema, _ = task
+        try:
+            cursor.execute(latest_snapshot.format(schema=schema))
+            adg_snapshot, dss_snapshot = cursor.fetchone()
+            snapshot_ids[task] = f"{adg_snapshot}:{dss_snapshot}"
+        except Exception:
+            cursor.connection.rollback()
+            logger.warning(
+                f"[Domain={sheet} | App={app_name} | Schema={schema}] Snapshot id unavailable, not cached"
+            )
+            snapshot_ids[task] = None
+
+    return snapshot_ids
+
+# ------------------ NEO4J COUNTS ------------------
+NEO4J_ENVIRONMENTS = {"V2": "", "V3": "V3_"}
+
+
+def neo4j_endpoint(environment):
+    prefix = NEO4J_ENVIRONMENTS[environment]
+    return (
+        config[f"{prefix}NEO4J_URL"],
+        config[f"{prefix}NEO4J_USER"],
+        config[f"{prefix}NEO4J_PASSWORD"],
+        config[f"{prefix}NEO4J_DB"].split(","),
     )
-    domains = cursor.fetchall()
 
-    with pd.ExcelWriter(
-        "V3_Upgrade_Apps_Validation.xlsx",
-        engine="openpyxl"
-    ) as writer:
 
-        # ---- TRACK DEFAULT APPS TO SKIP DUPLICATES ----
-        processed_default_apps = set()
+def collect_neo4j_counts(environment, app_names, all_app_names, run):
+    """Return {DisplayName: object count} for app_names on environment's Neo4j.
 
-        for domain_guid, domain_name in domains:
-            logger.info(
-                f"[Domain={domain_name} | GUID={domain_guid}] Starting domain processing"
+    With NEO4J_ASYNC the tenants are counted concurrently; when run.both_passes
+    is set, so are the other endpoint's, and its counts are kept in the RunState
+    for its own pass.
+    """
+    batch_size = config.getint("NEO4J_COUNT_BATCH_SIZE", 100)
+    validate_sample = config.getint("NEO4J_COUNT_VALIDATE_SAMPLE", 0)
+    mode = config.get("NEO4J_COUNT_MODE", "scan").strip().lower()
+    if mode not in COUNT_MODES:
+        logger.warning(f"Unknown NEO4J_COUNT_MODE '{mode}', using scan")
+        mode = "scan"
+    if mode == "count_store" and not validate_sample:
+        logger.warning(
+            "NEO4J_COUNT_MODE=count_store without NEO4J_COUNT_VALIDATE_SAMPLE: "
+            "totals are derived from label counts without any cross-check"
+        )
+
+    if environment in run.neo4j_counts:
+        logger.info(f"Using Neo4j object counts prefetched for {environment}")
+        return run.neo4j_counts.pop(environment)
+
+    if config.getboolean("NEO4J_ASYNC", False):
+        environments = NEO4J_ENVIRONMENTS if run.both_passes else [environment]
+        endpoints = {name: neo4j_endpoint(name) for name in environments}
+        object_counts = asyncio.run(fetch_neo4j_object_counts_async(
+            endpoints, neo4j_async_connection,
+            batch_size=batch_size,
+            concurrency=config.getint("NEO4J_CONCURRENCY", 4),
+            # Every application, so the prefetched counts also cover the other pass
+            app_names=all_app_names if run.both_passes else app_names,
+            mode=mode, validate_sample=validate_sample
+        ))
+        run.neo4j_counts.update(
+            {name: counts for name, counts in object_counts.items() if name != environment}
+        )
+        return object_counts[environment]
+
+    uri, user, password, tenants = neo4j_endpoint(environment)
+    neo4j_driver = neo4j_connection(uri, user, password)
+    try:
+        return fetch_neo4j_object_counts(
+            neo4j_driver, tenants, batch_size=batch_size, app_names=app_names,
+            mode=mode, validate_sample=validate_sample
+        )
+    finally:
+        neo4j_driver.close()
+
+
+def collect_neo4j_histograms(environment, app_names, all_app_names, run):
+    """Return {DisplayName: [[kind, type, count]]} for app_names, or {} without NEO4J_HISTOGRAMS.
+
+    Prefetched for the other environment under NEO4J_ASYNC and run.both_passes,
+    like the counts.
+    """
+    if not config.getboolean("NEO4J_HISTOGRAMS", False):
+        return {}
+    type_property = config.get("NEO4J_HISTOGRAM_TYPE_PROPERTY", "Type").strip()
+    relationships = config.getboolean("NEO4J_HISTOGRAM_RELATIONSHIPS", False)
+
+    if environment in run.neo4j_histograms:
+        logger.info(f"Using Neo4j object type histograms prefetched for {environment}")
+        return run.neo4j_histograms.pop(environment)
+
+    if config.getboolean("NEO4J_ASYNC", False):
+        environments = NEO4J_ENVIRONMENTS if run.both_passes else [environment]
+        endpoints = {name: neo4j_endpoint(name) for name in environments}
+        histograms = asyncio.run(fetch_neo4j_histograms_async(
+            endpoints, neo4j_async_connection,
+            concurrency=config.getint("NEO4J_CONCURRENCY", 4),
+            app_names=all_app_names if run.both_passes else app_names,
+            type_property=type_property, relationships=relationships
+        ))
+        run.neo4j_histograms.update(
+            {name: rows for name, rows in histograms.items() if name != environment}
+        )
+        return histograms[environment]
+
+    uri, user, password, tenants = neo4j_endpoint(environment)
+    neo4j_driver = neo4j_connection(uri, user, password)
+    try:
+        return fetch_neo4j_histograms(
+            neo4j_driver, tenants, app_names=app_names,
+            type_property=type_property, relationships=relationships
+        )
+    finally:
+        neo4j_driver.close()
+
+# ------------------ COLLECTION RUN ------------------
+def run_collection(environment, jobs=None, force=False, resume=False, shard=None, run=None):
+    """Yield (task, metrics, total_object_count) for every application collected successfully.
+
+    environment is "V2" or "V3" and selects the Neo4j server. Applications whose
+    snapshot is unchanged since the last run come from the snapshot store unless
+    force is set. Every application is journaled as it completes; with resume
+    the ones already journaled by the interrupted pass are not collected again.
+    shard (index, count) limits the pass to that shard's applications and
+    journals them to the shard's partial result file. run is the RunState
+    shared with the other pass of the same run, if any.
+    """
+    jobs = jobs or config.getint("COLLECTION_JOBS", 1)
+    run = run if run is not None else RunState()
+
+    connection = postgres_connection()
+    cursor = connection.cursor()
+    inventory = application_inventory(cursor, run)
+    if shard is not None:
+        full_size = len(inventory)
+        inventory = inventory.shard(*shard)
+        logger.info(f"Shard {shard[0]}/{shard[1]}: {len(inventory)} of {full_size} applications")
+    tasks = inventory.tasks
+
+    store = open_snapshot_store()
+    snapshot_ids = fetch_snapshot_ids(cursor, tasks) if store else {}
+    cursor.close()
+    connection.close()
+
+    journal = RunJournal(shard_path(*shard)) if shard is not None else open_journal()
+    journaled = {}
+    if journal and resume:
+        completed = journal.resume(environment)
+        journaled = {
+            task: completed[task[:3]] for task in tasks if task[:3] in completed
+        }
+        logger.info(
+            f"Resuming {environment}: {len(journaled)} of {len(tasks)} applications taken from {journal.path}"
+        )
+    elif journal:
+        journal.start(environment, shard)
+
+    stored = dict(journaled)
+    if store and force:
+        logger.info("Snapshot store bypassed (--force); all applications will be collected")
+    elif store:
+        for task in tasks:
+            sheet, app_name, schema, _ = task
+            if task in stored:
+                continue
+            record = store.get(environment, sheet, app_name, schema, snapshot_ids[task])
+            if record is not None:
+                stored[task] = record
+
+    reuse = shared_postgres_metrics(run)
+    if reuse is None:
+        reuse = {}
+    reuse.update({task: metrics for task, (metrics, _) in stored.items()})
+
+    # ---- Neo4j is only queried for applications the store could not serve ----
+    neo4j_object_counts = {}
+    neo4j_histograms = {}
+    missing_apps = {task[1] for task in tasks if task not in stored}
+    if missing_apps:
+        neo4j_histograms = collect_neo4j_histograms(
+            environment, missing_apps, inventory.names, run
+        )
+        if config.getboolean("NEO4J_HISTOGRAMS", False):
+            # The Object histogram already counts every live object: no second scan
+            neo4j_object_counts = histogram_object_totals(neo4j_histograms)
+        else:
+            neo4j_object_counts = collect_neo4j_counts(
+                environment, missing_apps, inventory.names, run
             )
 
-            cursor.execute(fetch_app_schema, (domain_guid,))
-            apps = cursor.fetchall()
-
-            cursor.execute(check_schemas)
-
-            for app_name, schema, app_domain_guid in apps:
-                sheet = domain_name if app_domain_guid else "default"
-
-                # ---- SKIP DUPLICATE DEFAULT APPS ----
-                if sheet == "default":
-                    if app_name in processed_default_apps:
-                        logger.warning(
-                            f"[Domain=default | App={app_name}] Skipping duplicate application"
-                        )
-                        continue
-                    processed_default_apps.add(app_name)
-
-                context = f"[Domain={sheet} | App={app_name} | Schema={schema}]"
-                logger.info(f"{context} Starting application processing")
-
-                try:
-                    # -------- CENTRAL --------
-                    cursor.execute(f"SET search_path TO {schema}_central")
-
-                    loc_query = loc_null if app_domain_guid is None else loc
-                    if app_domain_guid is None:
-                        cursor.execute(loc_query, (app_name,))
-                    else:
-                        cursor.execute(loc_query, (app_domain_guid, app_name))
-
-                    loc_rows = cursor.fetchall()
-                    logger.info(f" LOC rows for application {app_name}: {loc_rows}")
-
-                    cursor.execute(loc_per_tech)
-                    loc_per_tech_rows = cursor.fetchall()
-                    logger.info(f" LOC per tech rows for application {app_name}: {loc_per_tech_rows}")
-
-                    cursor.execute(extension_count)
-                    extension_count_rows = cursor.fetchall()
-                    logger.info(f" Extension rows for application {app_name}: {extension_count_rows}")
-
-                    cursor.execute(critical_violations)
-                    critical_violations_rows = cursor.fetchall()
-                    logger.info(f" critical violations rows for application {app_name}: {critical_violations_rows}")
-
-                    # -------- LOCAL --------
-                    cursor.execute(f"SET search_path TO {schema}_local")
-                    cursor.execute(dlms)
-                    dlms_rows = cursor.fetchall()
-                    logger.info(f" DLMS rows: for application {app_name} {dlms_rows}")
-                    cursor.execute(missing_code_db)
-                    missing_code_db_rows = cursor.fetchall()
-                    logger.info(f" Missing Code DB rowsfor application {app_name}: {len(missing_code_db_rows)}")
-                    cursor.execute(analyzed_files)
-                    analyzed_files_rows = cursor.fetchall()
-                    logger.info(f" Analyzed Files rows for application {app_name}: {analyzed_files_rows}")
-                    cursor.execute(missing_code)
-                    missing_codes = cursor.fetchall()
-                    logger.info(f" Missing Codes for application {app_name}: {len(missing_codes)}")
-
-                    # -------- MNGT --------
-                    cursor.execute(f"SET search_path TO {schema}_mngt")
-                    cursor.execute(customized_jobs)
-                    customized_jobs_rows = cursor.fetchall()
-                    logger.info("customized_jobs_rows for for application {} : {}".format(app_name,customized_jobs_rows))
-                    total_object_count = neo4j_object_counts.get(app_name, 0)
-
-                    if app_name in neo4j_object_counts:
-                        logger.info(f"Total objects for application '{app_name}' found: {total_object_count} in Neoej applications {neo4j_object_counts}" )
-                    else:
-                        logger.warning(
-                            f" Total objects for Application '{app_name}' not found in Neo4j object counts. Defaulting to 0")
-
-                except Exception:
-                    logger.exception(f"{context} ERROR during processing")
-                    continue
+    try:
+        for task, metrics in collect_applications(inventory, jobs, reuse):
+            if metrics is None:
+                continue
+            sheet, app_name, schema, _ = task
 
-                logger.info(
-                    f"{context} Completed successfully | Neo4j Objects={total_object_count}"
-                )
+            if task in stored:
+                total_object_count = stored[task][1]
+            else:
+                total_object_count = neo4j_object_counts.get(app_name, 0)
+
+                if app_name not in neo4j_object_counts:
+                    logger.warning(
+                        f" Total objects for Application '{app_name}' not found in Neo4j object counts. Defaulting to 0")
+
+                # A copy: the PostgreSQL metrics are shared with the other pass
+                metrics = dict(metrics, object_types=neo4j_histograms.get(app_name, []))
 
-                all_data = {
-                    "domain_name": sheet,
-                    "app_name": app_name,
-                    "loc": loc_rows,
-                    "loc_per_tech": loc_per_tech_rows,
-                    "extension_count": extension_count_rows,
-                    "dlms": dlms_rows,
-                    "missing_code_db": missing_code_db_rows,
-                    "analyzed_files": analyzed_files_rows,
-                    "Missing Code": missing_codes,
-                    "Dashboard - Critical violations": critical_violations_rows,
-                    "Total Object Count": [(total_object_count,)],
-                    "Customized Jobs": customized_jobs_rows
-                }
-
-                df = pd.DataFrame(build_excel_rows(all_data))
-                print(df)
-                startrow = (
-                    writer.sheets[sheet].max_row
-                    if sheet in writer.sheets else 0
+                if store and snapshot_ids[task] is not None:
+                    store.put(
+                        environment, sheet, app_name, schema, snapshot_ids[task],
+                        metrics, total_object_count
+                    )
+
+            if journal and task not in journaled:
+                journal.append(
+                    environment, sheet, app_name, schema, metrics, total_object_count,
+                    position=inventory.positions[task]
                 )
 
+            log_summary(logger, f"[Domain={sheet} | App={app_name} | Schema={schema}]", app_summary(
+                environment, metrics, total_object_count,
+                "journal" if task in journaled else "store" if task in stored else "collected"
+            ))
+
+            yield task, metrics, total_object_count
+    finally:
+        # Counts prefetched for this pass are stale once it ends, used or not
+        run.neo4j_counts.pop(environment, None)
+        run.neo4j_histograms.pop(environment, None)
+        if store:
+            store.close()
+        if journal:
+            journal.close()
+
+        dropped = dropped_records()
+        if any(dropped.values()):
+            logger.warning(
+                f"{environment}: log volume limits dropped {dropped['rate_limited']} rate-limited "
+                f"and {dropped['queue_full']} queued INFO record(s) so far"
+            )
+
+
+def app_summary(environment, metrics, total_object_count, source):
+    """The per-application log record: row counts, not the rows themselves."""
+    fields = {"Env": environment, "Source": source, "Neo4j Objects": total_object_count}
+    for key, rows in metrics.items():
+        fields[f"{key} rows"] = len(rows)
+    return fields
+
+# ------------------ PIPELINE ------------------
+def collection_stage(environment, jobs, force, stats, resume=False, run=None):
+    """run_collection on its own thread, feeding the caller through a bounded queue.
+
+    PIPELINE_QUEUE_SIZE=0 keeps collection and writing in one loop.
+    """
+    size = config.getint("PIPELINE_QUEUE_SIZE", 64)
+    if size <= 0:
+        return run_collection(environment, jobs, force, resume, run=run)
+    return pipelined(run_collection(environment, jobs, force, resume, run=run), size, stats)
+
+
+def report_pipeline(environment, stats):
+    if not stats.items:
+        return
+    logger.info(stats.summary(environment))
+    profiler.add_phase("pipeline_collect_wait", stats.producer_wait)
+    profiler.add_phase("pipeline_write_wait", stats.consumer_wait)
+
+# ------------------ EXCEL OUTPUT ------------------
+SHEET_COLUMNS = {TECH_SHEET: TECH_COLUMNS, OBJECT_TYPE_SHEET: OBJECT_TYPE_COLUMNS}
+
+
+
+def write_report_standard(excel_file, app_rows):
+    """Append each app's rows through pandas/openpyxl, keeping the whole workbook in memory."""
+    with pd.ExcelWriter(
+        excel_file,
+        engine="openpyxl"
+    ) as writer:
+
+        for sheet, rows in app_rows:
+            df = pd.DataFrame(rows, columns=SHEET_COLUMNS.get(sheet, REPORT_COLUMNS))
+            startrow = (
+                writer.sheets[sheet].max_row
+                if sheet in writer.sheets else 0
+            )
+
+            with profiler.phase("excel"):
                 df.to_excel(
                     writer,
                     sheet_name=sheet,
@@ -290,272 +752,462 @@ def generate_report():
                     header=startrow == 0
                 )
 
-    cursor.close()
-    connection.close()
-    neo4j_driver.close()
 
-    logger.info("V3_Upgrade_Apps_Validation.xlsx generated successfully")
+def write_report_streaming(excel_file, app_rows):
+    """Flush each app's rows into write-only worksheets, so memory stays flat as apps accumulate."""
+    wb = Workbook(write_only=True)
+    worksheets = {}
 
-def generate_report3():
-    logger.info("V3 Upgrade Validation started")
+    for sheet, rows in app_rows:
+        with profiler.phase("excel"):
+            ws = worksheets.get(sheet)
+            if ws is None:
+                ws = worksheets[sheet] = wb.create_sheet(sheet)
+                ws.append(SHEET_COLUMNS.get(sheet, REPORT_COLUMNS))
 
-    excel_file = "V3_Upgrade_Apps_Validation.xlsx"
+            for row in rows:
+                ws.append(row)
 
-    connection = postgres_connection()
-    cursor = connection.cursor()
+    with profiler.phase("excel"):
+        wb.save(excel_file)
 
-    neo4j_driver = neo4j_connection(
-        config['V3_NEO4J_URL'],
-        config['V3_NEO4J_USER'],
-        config['V3_NEO4J_PASSWORD']
-    )
 
-    tenants = config["V3_NEO4J_DB"].split(',')
-    neo4j_object_counts = fetch_neo4j_object_counts(
-        neo4j_driver, tenants
-    )
+def write_report(excel_file, app_rows):
+    if config.get("EXCEL_WRITE_MODE", "streaming").strip().lower() == "standard":
+        write_report_standard(excel_file, app_rows)
+    else:
+        write_report_streaming(excel_file, app_rows)
 
-    cursor.execute(
-        "SELECT guid, name FROM aip_node.domain ORDER BY guid ASC"
-    )
-    domains = cursor.fetchall()
-    processed_default_apps = set()
 
-    for domain_guid, domain_name in domains:
-        logger.info(
-            f"[Domain={domain_name} | GUID={domain_guid}] Starting domain processing"
-        )
+def write_table(excel_file, table, repeat_app=False, highlight=None):
+    """Write a whole MetricTable; rows flagged in `highlight` get a red, bold Variation cell.
+
+    Sheets keep the order of the workbook the table was read from, and
+    user-added columns and sheets are written back unchanged. New sheets go
+    after them.
+    """
+    red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+    bold_font = Font(bold=True)
+    variation_column = REPORT_COLUMNS.index("Variation")
+    wb = Workbook(write_only=True)
+
+    comparisons = {comparison.SHEET: comparison for comparison in table.comparisons() if len(comparison)}
+    written = set(dict.fromkeys(table.sheets)) | set(comparisons) | set(table.extra_sheets)
+    order = [sheet for sheet in table.sheet_order if sheet in written]
+    order += [sheet for sheet in dict.fromkeys(table.sheets) if sheet not in order]
+    order += [sheet for sheet in comparisons if sheet not in order]
+    order += [sheet for sheet in table.extra_sheets if sheet not in order]
+
+    # Write-only sheets can be filled in any order once created
+    worksheets = {sheet: wb.create_sheet(sheet) for sheet in order}
+
+    for sheet, rows in table.extra_sheets.items():
+        if sheet != UNMATCHED_SHEET:
+            logger.debug(f"Copying sheet '{sheet}' unchanged (no V2 / V3 columns)")
+        for row in rows:
+            worksheets[sheet].append(row)
+
+    for sheet, comparison in comparisons.items():
+        ws = worksheets[sheet]
+        ws.append(comparison.COLUMNS)
+        for _, rows in comparison.report_rows():
+            for row in rows:
+                ws.append(row)
+
+    started = set()
+    position = 0
+    for sheet, rows in table.app_rows(repeat_app):
+        ws = worksheets[sheet]
+        if sheet not in started:
+            print(f"Processing sheet: {sheet}")
+            started.add(sheet)
+            ws.append(REPORT_COLUMNS + table.extra_columns.get(sheet, []))
+
+        for row in rows:
+            if highlight is not None and highlight[position]:
+                cell = WriteOnlyCell(ws, value=row[variation_column])
+                cell.fill = red_fill
+                cell.font = bold_font
+                row[variation_column] = cell
+            ws.append(row)
+            position += 1
 
-        cursor.execute(fetch_app_schema, (domain_guid,))
-        apps = cursor.fetchall()
+    wb.save(excel_file)
+    WORKBOOK_IO["saves"] += 1
 
-        cursor.execute(check_schemas)
+# ------------------ MAIN REPORT ------------------
+def profile_path(excel_file, label):
+    return excel_file.rsplit(".", 1)[0] + f"_{label}_profile.json"
 
-        for app_name, schema, app_domain_guid in apps:
-            sheet = domain_name if app_domain_guid else "default"
 
-            # ---- SKIP DUPLICATE DEFAULT APPS ----
-            if sheet == "default":
-                if app_name in processed_default_apps:
-                    logger.warning(
-                        f"[Domain=default | App={app_name}] Skipping duplicate application"
-                    )
-                    continue
-                processed_default_apps.add(app_name)
+def generate_report(jobs=None, force=False, resume=False, run=None):
+    logger.info("V3 Upgrade Validation started")
+    profiler.reset()
 
-            context = f"[Domain={sheet} | App={app_name} | Schema={schema}]"
-            logger.info(f"{context} Starting application processing")
+    # Only the comparison tables are kept for the whole pass; each application's
+    # parameter rows are dropped once they are written
+    table = MetricTable()
 
-            try:
-                # -------- CENTRAL --------
-                cursor.execute(f"SET search_path TO {schema}_central")
+    stats = PipelineStats()
 
-                loc_query = loc_null if app_domain_guid is None else loc
-                if app_domain_guid is None:
-                    cursor.execute(loc_query, (app_name,))
-                else:
-                    cursor.execute(loc_query, (app_domain_guid, app_name))
-                loc_rows = cursor.fetchall()
+    def app_rows():
+        for task, metrics, total_object_count in collection_stage("V2", jobs, force, stats, resume, run):
+            sheet, app_name, schema, _ = task
+            context = f"[Domain={sheet} | App={app_name} | Schema={schema}]"
 
-                cursor.execute(loc_per_tech)
-                loc_per_tech_rows = cursor.fetchall()
+            logger.info(
+                f"{context} Completed successfully | Neo4j Objects={total_object_count}"
+            )
 
-                cursor.execute(extension_count)
-                extension_count_rows = cursor.fetchall()
+            app_table = MetricTable()
+            app_table.techs, app_table.object_types = table.techs, table.object_types
+            app_table.add(sheet, app_name, metrics, total_object_count)
+            yield sheet, app_table.rows(0, len(app_table))
 
-                cursor.execute(critical_violations)
-                critical_violations_rows = cursor.fetchall()
+        # Per-technology LOC and object types go last, once every application is in
+        for comparison in table.comparisons():
+            yield from comparison.report_rows()
 
-                # -------- LOCAL --------
-                cursor.execute(f"SET search_path TO {schema}_local")
-                cursor.execute(dlms)
-                dlms_rows = cursor.fetchall()
+    write_report("V3_Upgrade_Apps_Validation.xlsx", app_rows())
+    report_pipeline("V2", stats)
+    profiler.write(profile_path("V3_Upgrade_Apps_Validation.xlsx", "V2"))
 
-                cursor.execute(missing_code_db)
-                missing_code_db_rows = cursor.fetchall()
+    logger.info("V3_Upgrade_Apps_Validation.xlsx generated successfully")
+
+def generate_report3(jobs=None, force=False, resume=False, run=None):
+    logger.info("V3 Upgrade Validation started")
 
-                cursor.execute(analyzed_files)
-                analyzed_files_rows = cursor.fetchall()
+    excel_file = "V3_Upgrade_Apps_Validation.xlsx"
+    profiler.reset()
+
+    # ---- load the V2 workbook once, join V3 in memory, save once ----
+    io_before = dict(WORKBOOK_IO)
+    with profiler.phase("excel"):
+        table = MetricTable.from_workbook(excel_file)
+
+    v3_table = MetricTable()
+    stats = PipelineStats()
+    for task, metrics, total_object_count in collection_stage("V3", jobs, force, stats, resume, run):
+        sheet, app_name, _, _ = task
+        v3_table.add(sheet, app_name, metrics, total_object_count, side="V3")
+    report_pipeline("V3", stats)
+
+    with profiler.phase("excel"):
+        values_applied, v2_only, v3_only = join_v3(table, v3_table)
+        table.techs = table.techs.join(v3_table.techs)
+        table.object_types = table.object_types.join(v3_table.object_types)
+        report_unmatched(table, v2_only, v3_table, v3_only)
+        write_table(excel_file, table, repeat_app=True)
+
+    logger.info(
+        f"V3 merge: {WORKBOOK_IO['loads'] - io_before['loads']} workbook load(s), "
+        f"{WORKBOOK_IO['saves'] - io_before['saves']} workbook save(s), "
+        f"{values_applied} V3 values applied"
+    )
 
-                cursor.execute(missing_code)
-                missing_codes = cursor.fetchall()
+    profiler.write(profile_path(excel_file, "V3"))
 
-                # -------- MNGT --------
-                cursor.execute(f"SET search_path TO {schema}_mngt")
-                cursor.execute(customized_jobs)
-                customized_jobs_rows = cursor.fetchall()
+    logger.info("V3 Upgrade Validation completed")
+# ------------------ VARIATION ------------------
+VARIATION_THRESHOLD = 5
 
-                total_object_count = neo4j_object_counts.get(app_name, 0)
 
-            except Exception:
-                logger.exception(f"{context} ERROR during processing")
-                continue
+def numeric_variation(v2, v3):
+    """Percentage change from V2 to V3 for a whole column at once.
 
-            # ---- build all_data (UNCHANGED STRUCTURE) ----
-            all_data = {
-                "domain_name": sheet,
-                "app_name": app_name,
-                "loc": loc_rows,
-                "loc_per_tech": loc_per_tech_rows,
-                "extension_count": extension_count_rows,
-                "dlms": dlms_rows,
-                "missing_code_db": missing_code_db_rows,
-                "analyzed_files": analyzed_files_rows,
-                "Missing Code": missing_codes,
-                "Dashboard - Critical violations": critical_violations_rows,
-                "Total Object Count": [(total_object_count,)],
-                "Customized Jobs": customized_jobs_rows
-            }
-            # Read existing sheet
-            # Read existing sheet
-            df = pd.read_excel(excel_file, sheet_name=sheet)
-
-            # Fill empty App Name cells so all rows of an app have the app name
-            df["App Name"] = df["App Name"].replace('', pd.NA).ffill()
-
-            # Ensure V3 column can accept strings
-            df["V3"] = df["V3"].astype(object)
-
-            # Collect all V3 data for this sheet
-            excel_rows = pd.DataFrame(build_excel_rows_v3(all_data))
-            # Ensure App Name is filled for all rows
-            excel_rows["App Name"] = excel_rows["App Name"].replace('', pd.NA).ffill()
-
-            # Iterate over all unique apps in V3 data
-            for app in excel_rows["App Name"].unique():
-                mask = df["App Name"] == app
-                if mask.any():
-                    # Get V3 values for this app from excel_rows
-                    v3_values = excel_rows[excel_rows["App Name"] == app]["V3"].tolist()
-
-                    # Make sure lengths match; if fewer values, repeat last; if more, truncate
-                    if len(v3_values) < mask.sum():
-                        v3_values += [v3_values[-1]] * (mask.sum() - len(v3_values))
-                    elif len(v3_values) > mask.sum():
-                        v3_values = v3_values[:mask.sum()]
-
-                    # Assign row by row to the V3 column in Excel
-                    df.loc[mask, "V3"] = v3_values
-                else:
-                    logger.warning(f"App '{app}' not found in sheet '{sheet}'")
-
-            # Write back updated sheet
-            with pd.ExcelWriter(
-                    excel_file,
-                    engine="openpyxl",
-                    mode="a",
-                    if_sheet_exists="replace"
-            ) as writer:
-                df.to_excel(writer, sheet_name=sheet, index=False)
-
-        # ---- write back same sheet ----
-        # with pd.ExcelWriter(
-        #     excel_file,
-        #     engine="openpyxl",
-        #     mode="a",
-        #     if_sheet_exists="replace"
-        # ) as writer:
-        #     df.to_excel(writer, sheet_name=sheet, index=False)
+    Empty cells count as 0, a zero V2 gives 0, and non-numeric text leaves the
+    variation empty.
+    """
+    v2_num = pd.to_numeric(v2, errors="coerce")
+    v3_num = pd.to_numeric(v3, errors="coerce")
+    invalid = (v2.notna() & v2_num.isna()) | (v3.notna() & v3_num.isna())
+
+    v2_num = v2_num.fillna(0)
+    v3_num = v3_num.fillna(0)
+    variation = ((v3_num - v2_num) / v2_num.where(v2_num != 0) * 100).fillna(0)
+    # Python's round() rather than numpy's, so ties round exactly as before
+    variation = variation.map(lambda value: round(value, 2))
+
+    return variation.astype(object).where(~invalid, "")
+
+
+def _explode_breakdown(column):
+    # 'JEE:59803, SQL:0' -> one (row, tech, value) record per technology
+    # fillna first: astype(str) keeps None as NaN, and an all-NaN column has no .str
+    parts = column.fillna("").astype(str).str.split(",").explode().str.strip()
+    parts = parts[parts.str.contains(":", regex=False)]
+    fields = parts.str.split(":")
+    return pd.DataFrame({
+        "row": parts.index,
+        "tech": fields.str[0].values,
+        "value": pd.to_numeric(fields.str[1], errors="coerce").values
+    })
+
+
+def tech_variation(v2, v3):
+    """V2 - V3 per V2 technology for breakdown strings like 'JEE:59803, SQL:0'."""
+    v2_long = _explode_breakdown(v2).drop_duplicates(["row", "tech"], keep="last")
+    v3_long = _explode_breakdown(v3).drop_duplicates(["row", "tech"], keep="last")
+
+    merged = v2_long.merge(v3_long, on=["row", "tech"], how="left", suffixes=("_v2", "_v3"))
+    merged["invalid"] = merged["value_v2"].isna()
+    merged["diff"] = (merged["value_v2"] - merged["value_v3"].fillna(0)).fillna(0)
+    merged["text"] = merged["tech"] + ":" + merged["diff"].astype("int64").astype(str)
+
+    grouped = merged.groupby("row", sort=False)
+    variation = grouped["text"].agg(", ".join).where(~grouped["invalid"].any(), "")
+
+    # A breakdown that cannot be parsed on the V3 side, or an empty V3, gives no variation
+    v3_invalid = v3_long["value"].isna().groupby(v3_long["row"]).any()
+    # Not .str: a V3 column without any string (V2-only workbook, all zeros) has no such accessor
+    v3_empty = (
+        v3.isna()
+        | v3.map(lambda value: isinstance(value, str) and value == "").astype(bool)
+        | (pd.to_numeric(v3, errors="coerce") == 0)
+    )
+    variation = variation.reindex(v2.index, fill_value="")
+    variation[v3_empty | v3_invalid.reindex(v2.index, fill_value=False)] = ""
 
-    cursor.close()
-    connection.close()
-    neo4j_driver.close()
+    return variation
 
-    logger.info("V3 Upgrade Validation completed using build_excel_rows")
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font
 
 def calculate_variation_only_clean(excel_file):
     """
     Update only the 'Variation' column in all sheets,
     calculated as V2 - V3, supports numeric and tech breakdown strings like 'JEE:59803, SQL:0'.
+    The workbook is read into one MetricTable, computed column-wise across all sheets, and streamed back.
     """
-    red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-    bold_font = Font(bold=True)
+    profiler.reset()
 
-    def calculate_string_variation(v2_str, v3_str):
-        """Calculate variation for strings like 'JEE:59803, SQL:0'."""
-        if not v2_str or not v3_str:
-            return ""
-        try:
-            parts_v2 = [p.strip() for p in str(v2_str).split(",")]
-            parts_v3 = [p.strip() for p in str(v3_str).split(",")]
-            dict_v2 = {p.split(":")[0]: float(p.split(":")[1]) for p in parts_v2 if ":" in p}
-            dict_v3 = {p.split(":")[0]: float(p.split(":")[1]) for p in parts_v3 if ":" in p}
-            variation_dict = {k: dict_v2.get(k, 0) - dict_v3.get(k, 0) for k in dict_v2.keys()}
-            variation_str = ", ".join(f"{k}:{int(v)}" for k, v in variation_dict.items())
-            return variation_str
-        except:
-            return ""
-
-    wb = load_workbook(excel_file)
-
-    for sheet in wb.sheetnames:
-        print(f"Processing sheet: {sheet}")
-        ws = wb[sheet]
-
-        # Find column indexes
-        headers = {cell.value: idx + 1 for idx, cell in enumerate(ws[1])}  # 1-based
-        col_v2 = headers.get("V2")
-        col_v3 = headers.get("V3")
-        col_variation = headers.get("Variation")
-
-        if not col_v2 or not col_v3:
-            print(f"Skipping sheet '{sheet}': V2 or V3 column not found")
-            continue
+    with profiler.phase("excel"):
+        table = MetricTable.from_workbook(excel_file)
+        flagged = compute_variation(table)
+        write_table(excel_file, table, repeat_app=True, highlight=flagged)
 
-        # If Variation column does not exist, create it at the end
-        if not col_variation:
-            col_variation = ws.max_column + 1
-            ws.cell(row=1, column=col_variation, value="Variation")
+    profiler.write(profile_path(excel_file, "variation"))
+    print("Variation column updated for all sheets, including tech breakdowns.")
 
-        # Calculate Variation for each row
-        for row in range(2, ws.max_row + 1):
-            v2 = ws.cell(row=row, column=col_v2).value
-            v3 = ws.cell(row=row, column=col_v3).value
 
-            # Check if value is a tech breakdown string
-            if isinstance(v2, str) and ":" in v2:
-                variation = calculate_string_variation(v2, v3)
-            else:
-                try:
-                    v2_num = float(v2) if v2 is not None else 0
-                    v3_num = float(v3) if v3 is not None else 0
-
-                    # If both are zero → variation = 0
-                    if v2_num == 0 and v3_num == 0:
-                        variation = 0
-                    elif v2_num == 0:
-                        # Avoid division by zero → just put v3 value or leave empty
-                        variation = 0
-                    else:
-                        # Normal percentage variation
-                        variation = round(((v3_num - v2_num) / v2_num) * 100, 2)
-                except:
-                    variation = ""  # leave empty if not numeric
-
-            ws.cell(row=row, column=col_variation, value=variation)
-
-
-            # Conditional formatting: red + bold if numeric variation exceeds ±5
-            try:
-                if isinstance(variation, (int, float)) and abs(variation) > 5:
-                    cell = ws.cell(row=row, column=col_variation)
-                    cell.fill = red_fill
-                    cell.font = bold_font
-            except:
-                continue
+def compute_variation(table):
+    """Fill table.variation in one vectorized pass; returns the rows to highlight."""
+    df = table.frame()
+    # .str would fail on a column without a single string (no breakdown anywhere)
+    is_breakdown = df["V2"].map(lambda value: isinstance(value, str) and ":" in value).astype(bool)
+
+    variation = numeric_variation(df["V2"], df["V3"])
+    if is_breakdown.any():
+        variation[is_breakdown] = tech_variation(df["V2"][is_breakdown], df["V3"][is_breakdown])
+
+    # Conditional formatting: red + bold if numeric variation exceeds ±5
+    numeric = pd.to_numeric(variation.where(~is_breakdown), errors="coerce")
+    table.variation = variation.tolist()
+    return (numeric.abs() > VARIATION_THRESHOLD).tolist()
+
+# ------------------ QUERY PLAN AUDIT ------------------
+def audit_sample(cursor, tasks, size):
+    """The `size` largest schema triplets used by tasks, all three schemas present."""
+    cursor.execute(schema_sizes)
+    sizes = dict(cursor.fetchall())
+
+    prefixes = {
+        schema: sum(sizes.get(f"{schema}_{suffix}", 0) for suffix in ("central", "local", "mngt"))
+        for _, _, schema, _ in tasks
+        if all(f"{schema}_{suffix}" in sizes for suffix in ("central", "local", "mngt"))
+    }
+    return sorted(prefixes, key=lambda schema: prefixes[schema], reverse=True)[:size]
+
+
+def run_query_audit():
+    logger.info("Query plan audit started")
+
+    connection = postgres_connection()
+    # Audit statements must never be left in an open transaction on the CSS
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        tasks = application_inventory(cursor).tasks
+        prefixes = audit_sample(cursor, tasks, config.getint("QUERY_AUDIT_SAMPLE", 5))
+        logger.info(f"Auditing {len(prefixes)} schema triplet(s): {', '.join(prefixes)}")
+
+        report = audit_queries(
+            cursor, prefixes,
+            [(name, suffix, query) for name, suffix, query, *_ in SCHEMA_QUERIES],
+            repeat=config.getint("QUERY_AUDIT_REPEAT", 3),
+            seq_scan_rows=config.getint("QUERY_AUDIT_SEQ_SCAN_ROWS", 100000),
+            min_gain=config.getfloat("QUERY_AUDIT_MIN_GAIN", 0.1),
+        )
+    finally:
+        cursor.close()
+        connection.close()
+
+    write_audit(
+        report,
+        config.get("QUERY_AUDIT_REPORT", "query_audit.json"),
+        config.get("QUERY_VARIANTS_FILE", "query_variants.json"),
+    )
+    logger.info("Query plan audit completed")
+
+# ------------------ OBJECT SET DIFF ------------------
+OBJECT_SET_SHEET = "Object Sets"
+OBJECT_SET_COLUMNS = ["Sheet", "App Name", "V2 Objects", "V3 Objects", "Differing Buckets", "Added", "Removed"]
+OBJECT_DIFF_SHEET = "Object Differences"
+OBJECT_DIFF_COLUMNS = ["Sheet", "App Name", "Change", "Object"]
+
+
+def write_object_diff(excel_file, inventory, diff):
+    wb = Workbook(write_only=True)
+    summary = wb.create_sheet(OBJECT_SET_SHEET)
+    summary.append(OBJECT_SET_COLUMNS)
+    changes = wb.create_sheet(OBJECT_DIFF_SHEET)
+    changes.append(OBJECT_DIFF_COLUMNS)
+
+    # In report order; an application listed in several domains shows all of them
+    for app_name in inventory.by_name:
+        result = diff.get(app_name)
+        if result is None:
+            continue
+        sheet = ", ".join(dict.fromkeys(task[0] for task in inventory.by_name[app_name]))
+        summary.append([
+            sheet, app_name, result["V2"], result["V3"], result["buckets"],
+            len(result["added"]), len(result["removed"])
+        ])
+        for key in result["added"]:
+            changes.append([sheet, app_name, "Added", key])
+        for key in result["removed"]:
+            changes.append([sheet, app_name, "Removed", key])
 
     wb.save(excel_file)
-    print("Variation column updated for all sheets, including tech breakdowns.")
+    logger.info(f"{excel_file} generated successfully")
+
+
+def run_object_diff():
+    """Compare the Neo4j object sets of every application between V2 and V3."""
+    logger.info("Object set comparison started")
+    profiler.reset()
+
+    connection = postgres_connection()
+    cursor = connection.cursor()
+    try:
+        inventory = application_inventory(cursor)
+    finally:
+        cursor.close()
+        connection.close()
+
+    endpoints = {}
+    try:
+        for environment in NEO4J_ENVIRONMENTS:
+            uri, user, password, tenants = neo4j_endpoint(environment)
+            endpoints[environment] = (neo4j_connection(uri, user, password), tenants)
+
+        diff = diff_neo4j_object_sets(
+            endpoints, app_names=inventory.names,
+            key_property=config.get("NEO4J_FINGERPRINT_PROPERTY", "FullName").strip(),
+            leaf_size=max(1, config.getint("NEO4J_FINGERPRINT_LEAF_SIZE", 64)),
+        )
+    finally:
+        for driver, _ in endpoints.values():
+            driver.close()
+
+    for app_name, result in diff.items():
+        if result["added"] or result["removed"]:
+            logger.warning(
+                f"[App={app_name}] Object set changed: {len(result['added'])} added, "
+                f"{len(result['removed'])} removed"
+            )
+
+    excel_file = config.get("OBJECT_DIFF_FILE", "V3_Upgrade_Object_Diff.xlsx")
+    write_object_diff(excel_file, inventory, diff)
+    profiler.write(excel_file.rsplit(".", 1)[0] + "_profile.json")
+    logger.info("Object set comparison completed")
+
+# ------------------ SHARDED RUNS ------------------
+def run_shard(shard, jobs=None, force=False, resume=False):
+    """Collect V2 and V3 for one shard into its partial result file; no workbook is written."""
+    index, count = shard
+    path = shard_path(index, count)
+    logger.info(f"Shard {index}/{count} started, writing {path}")
+
+    run = RunState(both_passes=True)
+    for environment in NEO4J_ENVIRONMENTS:
+        collected = sum(1 for _ in run_collection(environment, jobs, force, resume, shard, run))
+        logger.info(f"Shard {index}/{count}: {collected} {environment} application(s) in {path}")
 
+    logger.info(f"Shard {index}/{count} completed")
 
-def main_menu():
+
+def merge_shards(paths, excel_file="V3_Upgrade_Apps_Validation.xlsx"):
+    """Build the final workbook, variation included, from shard partial result files.
+
+    Applications are placed by their inventory position, so the result does
+    not depend on the order of `paths`; an application found in two files is
+    taken from the one whose path sorts last.
+    """
+    logger.info(f"Merging {len(paths)} shard file(s) into {excel_file}")
+    profiler.reset()
+
+    entries = {environment: {} for environment in NEO4J_ENVIRONMENTS}
+    shards = {}
+    for path in sorted(paths):
+        journal = RunJournal(path)
+        shard = journal.shard()
+        if shard is None:
+            logger.warning(f"{path} is not a shard file, merged anyway")
+        elif shard in shards:
+            logger.warning(f"Shard {shard[0]}/{shard[1]} found in both {shards[shard]} and {path}")
+        shards.setdefault(shard, path)
+
+        for environment in entries:
+            for key, record in journal.entries(environment).items():
+                if key in entries[environment]:
+                    logger.warning(
+                        f"[Domain={key[0]} | App={key[1]} | Schema={key[2]}] "
+                        f"{environment} result found in several shard files, using {path}"
+                    )
+                entries[environment][key] = record
+
+    counts = {shard[1] for shard in shards if shard is not None}
+    if len(counts) > 1:
+        logger.warning(f"Shard files come from runs with different shard counts: {sorted(counts)}")
+    for count in counts:
+        missing = sorted(set(range(1, count + 1)) - {shard[0] for shard in shards if shard and shard[1] == count})
+        if missing:
+            logger.warning(f"Shards missing out of {count}: {', '.join(map(str, missing))}")
+
+    tables = {}
+    for environment, records in entries.items():
+        table = tables[environment] = MetricTable()
+        ordered = sorted(
+            records.items(),
+            key=lambda item: (item[1].get("position") is None, item[1].get("position") or 0, item[0])
+        )
+        for (sheet, app_name, _), record in ordered:
+            table.add(sheet, app_name, record["metrics"], record["total_object_count"], side=environment)
+
+    table, v3_table = tables["V2"], tables["V3"]
+    with profiler.phase("excel"):
+        _, v2_only, v3_only = join_v3(table, v3_table)
+        table.techs = table.techs.join(v3_table.techs)
+        table.object_types = table.object_types.join(v3_table.object_types)
+        report_unmatched(table, v2_only, v3_table, v3_only)
+        flagged = compute_variation(table)
+        write_table(excel_file, table, repeat_app=True, highlight=flagged)
+
+    profiler.write(profile_path(excel_file, "merge"))
+    logger.info(
+        f"{excel_file} generated from {len(entries['V2'])} V2 and {len(entries['V3'])} V3 application(s)"
+    )
+
+
+
+def main_menu(jobs=None, force=False, resume=False):
     while True:
         print("\nPlease choose an option:")
         print("1: Generate V2 report")
         print("2: Generate V3 report")
         print("3: Calculate Variation")
+        print("4: Generate V2 and V3 reports (shared PostgreSQL collection)")
+        print("5: Audit query plans")
+        print("6: Compare V2 and V3 object sets")
         print("0: Exit")
         try:
             choice = int(input("Enter your choice: "))
@@ -564,16 +1216,28 @@ def main_menu():
             continue
 
         if choice == 1:
-            generate_report()  # Your existing V2 function
+            generate_report(jobs, force, resume)  # Your existing V2 function
         elif choice == 2:
-            generate_report3()  # Your existing V3 function
+            generate_report3(jobs, force, resume)  # Your existing V3 function
         elif choice == 3:
             calculate_variation_only_clean("V3_Upgrade_Apps_Validation.xlsx")
+        elif choice == 4:
+            run = RunState(both_passes=True)
+            generate_report(jobs, force, resume, run)
+            generate_report3(jobs, force, resume, run)  # PostgreSQL metrics come from the V2 pass
+        elif choice == 5:
+            run_query_audit()
+        elif choice == 6:
+            run_object_diff()
         elif choice == 0:
             print("Exiting...")
             break
         else:
-            print("Invalid choice. Please enter 0, 1, 2, or 3.")
+            print("Invalid choice. Please enter 0, 1, 2, 3, 4, 5, or 6.")
+            continue
+
+        # --resume only applies to the interrupted pass, later choices start fresh
+        resume = False
 
         # Ask if user wants to continue
         cont = input("Do you want to continue? (Y/N): ").strip().lower()
@@ -583,6 +1247,12 @@ def main_menu():
 
 
 if __name__ == "__main__":
-    main_menu()
+    import sys
+
+    # cli imports this module by name; let it find this run instead of loading a second copy
+    sys.modules.setdefault("LM_Validation", sys.modules[__name__])
+    import cli
+
+    sys.exit(cli.main(default_command="menu"))
 
 
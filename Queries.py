@@ -79,11 +79,62 @@ check_app_schema="""
                     WHERE nspname LIKE %s;
                 """
 
-fetch_app_schema=""" set search_path to aip_node;
-               SELECT a.name, b.schema_prefix,a.domain_guid
-FROM application a
-JOIN connection_profile b
+# Every application once, in report order: domains by guid, the default
+# (domain-less) applications right after the first domain
+application_inventory="""SELECT a.name, b.schema_prefix, a.domain_guid, d.name
+FROM aip_node.application a
+JOIN aip_node.connection_profile b
   ON a.connection_profile_guid = b.guid
-WHERE (a.domain_guid = %s
-       OR a.domain_guid IS NULL);
-            """
\ No newline at end of file
+LEFT JOIN aip_node.domain d
+  ON d.guid = a.domain_guid
+WHERE a.domain_guid IS NULL
+   OR d.guid IS NOT NULL
+ORDER BY COALESCE(a.domain_guid, (SELECT MIN(guid) FROM aip_node.domain)),
+         a.domain_guid IS NULL,
+         a.name,
+         a.guid;"""
+
+latest_snapshot="""SELECT
+    (SELECT MAX(snapshot_id) FROM {schema}_central.adg_delta_snapshots WHERE latest = 1),
+    (SELECT MAX(snapshot_id) FROM {schema}_central.dss_snapshots);"""
+
+neo4j_applications="""
+                MATCH(n:Application)
+RETURN n.DisplayName as consoleApp_name ,n.Name as app_name
+            """
+
+# ---- Alternative forms picked by the query audit (see query_audit.py) ----
+# {adg_snapshot} / {dss_snapshot} are resolved once per schema before running
+loc_per_tech_join="""select distinct dos.object_name as technology,dmr.metric_num_value as LOC from dss_metric_results dmr
+join dss_objects dos on dmr.object_id = dos.object_id
+join dss_object_types dot on dot.object_type_id = dos.object_type_id
+where dot.object_group = 2
+and dmr.snapshot_id = {adg_snapshot}
+and dmr.metric_id = 10151
+"""
+
+critical_violations_snapshot="""SELECT
+    dmt.metric_id,
+    dmt.metric_name,
+    dmr.metric_num_value AS current
+FROM dss_metric_results dmr
+JOIN dss_metric_types dmt
+    ON dmr.metric_id = dmt.metric_id
+JOIN dss_objects o
+    ON dmr.object_id = o.object_id
+WHERE o.object_type_id = -102
+AND dmr.snapshot_id = {dss_snapshot}
+AND dmr.metric_id IN (67011)
+AND dmr.metric_value_index IN (0, 1);
+"""
+
+missing_code_strpos="""SELECT COUNT(*)
+FROM cdt_objects
+WHERE strpos(object_fullname, 'Unknown') > 0;
+"""
+
+schema_sizes="""SELECT n.nspname, SUM(pg_total_relation_size(c.oid))
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind = 'r'
+GROUP BY n.nspname;"""
@@ -0,0 +1,99 @@
+import zlib
+
+from logger import get_logger
+from Queries import application_inventory, check_schemas
+
+logger = get_logger(__name__)
+
+SCHEMA_SUFFIXES = ("central", "local", "mngt")
+
+
+def parse_shard(text):
+    """"i/N" -> (i, N), with 1 <= i <= N."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like 2/4, got '{text}'")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def shard_of(task, count):
+    """1-based shard of a task among `count`; the same on every host and Python run."""
+    sheet, app_name, schema, _ = task
+    return zlib.crc32(f"{sheet}\0{app_name}\0{schema}".encode("utf-8")) % count + 1
+
+
+class ApplicationInventory:
+    """Every application of the CSS, read once per run.
+
+    tasks are (sheet, app_name, schema, app_domain_guid) in report order, as
+    the collectors expect them. They are indexed by sheet (domain name or
+    "default") and by application name; schemas holds the schema names that
+    exist on the CSS, for the triplet checks. positions gives each task's
+    place in the full inventory, also once it is sharded.
+    """
+
+    def __init__(self, tasks, schemas, positions=None):
+        self.tasks = tasks
+        self.schemas = schemas
+        self.positions = positions if positions is not None else {task: i for i, task in enumerate(tasks)}
+        self.by_domain = {}
+        self.by_name = {}
+        for task in tasks:
+            self.by_domain.setdefault(task[0], []).append(task)
+            self.by_name.setdefault(task[1], []).append(task)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    @property
+    def names(self):
+        """Application names across all domains, for the Neo4j name matching."""
+        return set(self.by_name)
+
+    def shard(self, index, count):
+        """The applications of shard `index` (1-based) out of `count`."""
+        tasks = [task for task in self.tasks if shard_of(task, count) == index]
+        return ApplicationInventory(tasks, self.schemas, self.positions)
+
+    def missing_schemas(self, task):
+        schema = task[2]
+        return [
+            f"{schema}_{suffix}" for suffix in SCHEMA_SUFFIXES
+            if f"{schema}_{suffix}" not in self.schemas
+        ]
+
+    @classmethod
+    def load(cls, cursor):
+        cursor.execute(application_inventory)
+        rows = cursor.fetchall()
+        cursor.execute(check_schemas)
+        schemas = {row[0] for row in cursor.fetchall()}
+
+        tasks = []
+        default_apps = set()
+        for app_name, schema, app_domain_guid, domain_name in rows:
+            sheet = domain_name if app_domain_guid else "default"
+
+            # ---- SKIP DUPLICATE DEFAULT APPS ----
+            if sheet == "default":
+                if app_name in default_apps:
+                    logger.warning(
+                        f"[Domain=default | App={app_name}] Skipping duplicate application"
+                    )
+                    continue
+                default_apps.add(app_name)
+
+            tasks.append((sheet, app_name, schema, app_domain_guid))
+
+        inventory = cls(tasks, schemas)
+        logger.info(
+            f"Application inventory: {len(inventory)} applications in "
+            f"{len(inventory.by_domain)} domain(s), {len(schemas)} schemas on the CSS"
+        )
+        return inventory
@@ -0,0 +1,135 @@
+"""End-to-end benchmark: V2 report, V3 report and variation on a synthetic CSS.
+
+Needs a local PostgreSQL it may freely write to (see synthetic_css.py); Neo4j
+is replaced by the in-process stand-in. Each scale runs in its own process so
+peak RSS is measured in isolation.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --host localhost --port 5432 \\
+        --user postgres --password postgres --dbname bench \\
+        --scales 1x10,5x20 --set COLLECTION_JOBS=4 --set COLLECTION_MODE=bulk
+
+A scale DxA means D domains with A applications each.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+EXCEL_FILE = "V3_Upgrade_Apps_Validation.xlsx"
+
+
+def _phase(name, func, apps):
+    from profiler import profiler
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        func()
+    elapsed = time.perf_counter() - start
+
+    neo4j = sum(1 for record in profiler.records if record["phase"] == "neo4j")
+    return {
+        "phase": name,
+        "seconds": elapsed,
+        "apps_per_sec": apps / elapsed if elapsed else 0.0,
+        "pg_queries": len(profiler.records) - neo4j,
+        "neo4j_queries": neo4j,
+        "output_kb": os.path.getsize(EXCEL_FILE) / 1024,
+    }
+
+
+def child(args, domains, apps_per_domain):
+    import psycopg2
+
+    import LM_Validation
+    from fake_neo4j import FakeAsyncNeo4jDriver, FakeNeo4jDriver
+    from synthetic_css import build_css, neo4j_databases
+
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("LM_Validation", "neo4j_counts", "profiler", "snapshot_store", "bulk_collection"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    pg = dict(host=args.host, port=args.port, user=args.user, password=args.password, dbname=args.dbname)
+    for key, value in zip(("CSS_HOST", "CSS_PORT", "CSS_USERNAME", "CSS_PASSWORD", "CSS_DB"), pg.values()):
+        LM_Validation.config[key] = str(value)
+    LM_Validation.config["SNAPSHOT_STORE"] = ""
+    for override in args.set:
+        key, _, value = override.partition("=")
+        LM_Validation.config[key] = value
+    LM_Validation.profiler.enabled = True
+
+    connection = psycopg2.connect(**pg)
+    apps = build_css(
+        connection, domains=domains, apps_per_domain=apps_per_domain,
+        default_apps=args.default_apps, objects=args.objects, shared_every=args.shared_every
+    )
+    connection.close()
+
+    databases = neo4j_databases(apps, args.objects)
+    latency = args.neo4j_latency_ms / 1000
+    LM_Validation.neo4j_connection = lambda *_: FakeNeo4jDriver(databases, latency=latency)
+    LM_Validation.neo4j_async_connection = lambda *_: FakeAsyncNeo4jDriver(databases, latency=latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        run = LM_Validation.RunState(both_passes=True)
+        results = [
+            _phase("v2", lambda: LM_Validation.generate_report(run=run), len(apps)),
+            _phase("v3", lambda: LM_Validation.generate_report3(run=run), len(apps)),
+            _phase("variation", lambda: LM_Validation.calculate_variation_only_clean(EXCEL_FILE), len(apps)),
+        ]
+        os.chdir(ROOT)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"apps": len(apps), "peak_mb": peak_mb, "phases": results}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--scales", default="1x10,5x20")
+    parser.add_argument("--default-apps", type=int, default=2)
+    parser.add_argument("--objects", type=int, default=5000, help="objects per application schema")
+    parser.add_argument("--shared-every", type=int, default=0, help="applications per shared schema triplet")
+    parser.add_argument("--neo4j-latency-ms", type=float, default=1.0)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a config.properties value for the run")
+    parser.add_argument("--child", nargs=2, type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args, *args.child)
+        return
+
+    print(f"{'apps':>6} {'phase':>10} {'seconds':>9} {'apps/s':>9} {'pg q':>7} {'neo4j q':>8} {'xlsx KB':>9} {'peak MB':>8}")
+    for scale in args.scales.split(","):
+        domains, apps_per_domain = (int(n) for n in scale.lower().split("x"))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--child", str(domains), str(apps_per_domain)],
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for phase in result["phases"]:
+            print(
+                f"{result['apps']:>6} {phase['phase']:>10} {phase['seconds']:>9.2f} "
+                f"{phase['apps_per_sec']:>9.1f} {phase['pg_queries']:>7} {phase['neo4j_queries']:>8} "
+                f"{phase['output_kb']:>9.1f} {result['peak_mb']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
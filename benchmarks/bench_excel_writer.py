@@ -0,0 +1,96 @@
+"""Compare the standard and streaming workbook writers.
+
+Each case runs in its own process so peak RSS is measured in isolation.
+
+Usage: python benchmarks/bench_excel_writer.py --apps 100,1000,10000
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+APPS_PER_DOMAIN = 50
+
+
+def synthetic_app_rows(n_apps):
+    from metric_records import MetricTable
+
+    table = MetricTable()
+    for i in range(n_apps):
+        metrics = {
+            "loc": [(100_000 + i,)],
+            "loc_per_tech": [("JEE", 60_000 + i), ("SQL", 40_000)],
+            "extension_count": [(12,)],
+            "critical_violations": [(67011, "Critical violations", 42.0)],
+            "dlms": [(i % 7,)],
+            "missing_code_db": [(3,)],
+            "analyzed_files": [(2_000 + i,)],
+            "missing_code": [(5,)],
+            "customized_jobs": [(1,)],
+        }
+        sheet = f"Domain{i // APPS_PER_DOMAIN}"
+        # As generate_report: only the comparison tables outlive an application
+        app_table = MetricTable()
+        app_table.techs, app_table.object_types = table.techs, table.object_types
+        app_table.add(sheet, f"app_{i}", metrics, 10_000 + i)
+        yield sheet, app_table.rows(0, len(app_table))
+
+
+def child(mode, n_apps):
+    import LM_Validation
+
+    logging.getLogger("LM_Validation").setLevel(logging.WARNING)
+    writer = {
+        "standard": LM_Validation.write_report_standard,
+        "streaming": LM_Validation.write_report_streaming,
+    }[mode]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_file = os.path.join(tmp, "bench.xlsx")
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            writer(excel_file, synthetic_app_rows(n_apps))
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(excel_file)
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_mb": peak_kb / 1024, "size_kb": size / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", default="100,1000,10000")
+    parser.add_argument("--modes", default="standard,streaming")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "APPS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'apps':>6} {'mode':>10} {'seconds':>9} {'peak RSS MB':>12} {'file KB':>9}")
+    for n_apps in (int(n) for n in args.apps.split(",")):
+        for mode in args.modes.split(","):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, str(n_apps)],
+                check=True, stdout=subprocess.PIPE, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{n_apps:>6} {mode:>10} {result['seconds']:>9.2f} "
+                f"{result['peak_mb']:>12.1f} {result['size_kb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time spent logging on the calling thread, synchronous vs queued.
+
+Each case runs in its own process: it logs --records INFO records of about
+--size characters to a log file in a temporary directory (console output is
+discarded) and reports the time the caller spent in the logging calls, the
+time until everything was written, and the size of the log file.
+
+Usage: python benchmarks/bench_logging.py --records 20000 --size 200,20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = {
+    "sync": dict(asynchronous=False, max_length=0, rate=0),
+    "sync+limits": dict(asynchronous=False, max_length=2000, rate=500),
+    "async": dict(asynchronous=True, max_length=0, rate=0),
+    "async+limits": dict(asynchronous=True, max_length=2000, rate=500),
+}
+
+
+def child(case, records, size):
+    os.chdir(tempfile.mkdtemp())
+    sys.stderr = open(os.devnull, "w")
+
+    import logger
+
+    log = logger.get_logger("bench")
+    logger.configure_logging(queue_size=10000, **CASES[case])
+    payload = "x" * size
+
+    start = time.perf_counter()
+    for i in range(records):
+        log.info(f"[Domain=bench | App=app_{i}] rows: {payload}")
+    caller = time.perf_counter() - start
+    dropped = sum(logger.dropped_records().values())
+    logger.flush_logging()
+    total = time.perf_counter() - start
+
+    size_kb = sum(os.path.getsize(name) for name in os.listdir(".")) / 1024
+    print(json.dumps({
+        "caller_s": caller, "total_s": total, "log_kb": size_kb,
+        "dropped": dropped,
+    }), file=sys.__stdout__)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--size", default="200,20000")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--child", nargs=3, metavar=("CASE", "RECORDS", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]), int(args.child[2]))
+        return
+
+    print(f"{'size':>6} {'case':>13} {'caller s':>9} {'total s':>8} {'log KB':>9} {'dropped':>8}")
+    for size in (int(n) for n in args.size.split(",")):
+        for case in args.cases.split(","):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", case, str(args.records), str(size)],
+                check=True, stdout=subprocess.PIPE, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{size:>6} {case:>13} {result['caller_s']:>9.3f} {result['total_s']:>8.3f} "
+                f"{result['log_kb']:>9.0f} {result['dropped']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
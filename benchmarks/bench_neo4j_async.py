@@ -0,0 +1,69 @@
+"""Compare sequential and asyncio Neo4j object counting over both endpoints.
+
+Usage: python benchmarks/bench_neo4j_async.py --apps 100,500 --latency-ms 5 --concurrency 1,4,8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fake_neo4j import FakeAsyncNeo4jDriver, FakeNeo4jDriver, build_databases  # noqa: E402
+from neo4j_counts import fetch_neo4j_object_counts, fetch_neo4j_object_counts_async  # noqa: E402
+
+ENVIRONMENTS = ("V2", "V3")
+
+
+def run_sequential(databases, tenants, batch_size, latency):
+    start = time.perf_counter()
+    counts = {}
+    for environment in ENVIRONMENTS:
+        driver = FakeNeo4jDriver(databases, latency=latency)
+        counts[environment] = fetch_neo4j_object_counts(driver, tenants, batch_size=batch_size)
+    return counts, time.perf_counter() - start
+
+
+def run_async(databases, tenants, batch_size, latency, concurrency):
+    endpoints = {environment: (environment, None, None, tenants) for environment in ENVIRONMENTS}
+    start = time.perf_counter()
+    counts = asyncio.run(fetch_neo4j_object_counts_async(
+        endpoints, lambda *_: FakeAsyncNeo4jDriver(databases, latency=latency),
+        batch_size=batch_size, concurrency=concurrency
+    ))
+    return counts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", default="100,500")
+    parser.add_argument("--tenants", default="neo4j,imaging,tenant3,tenant4")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=0, help="0 = one query per application")
+    parser.add_argument("--concurrency", default="1,4,8")
+    args = parser.parse_args()
+
+    logging.getLogger("neo4j_counts").setLevel(logging.WARNING)
+    tenants = args.tenants.split(",")
+    latency = args.latency_ms / 1000
+    batch_size = args.batch_size or None
+
+    print(f"{'apps':>6} {'mode':>12} {'seconds':>9} {'speedup':>8}")
+    for n_apps in (int(n) for n in args.apps.split(",")):
+        databases = build_databases(tenants, n_apps)
+        expected, baseline = run_sequential(databases, tenants, batch_size, latency)
+        print(f"{n_apps:>6} {'sequential':>12} {baseline:>9.3f} {1.0:>8.2f}")
+
+        for concurrency in (int(n) for n in args.concurrency.split(",")):
+            counts, elapsed = run_async(databases, tenants, batch_size, latency, concurrency)
+            if counts != expected:
+                raise SystemExit(f"Result mismatch at {n_apps} apps, concurrency {concurrency}")
+            print(f"{n_apps:>6} {f'async x{concurrency}':>12} {elapsed:>9.3f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
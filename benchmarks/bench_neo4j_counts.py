@@ -0,0 +1,67 @@
+"""Compare per-application, batched and count-store Neo4j object counting.
+
+Usage: python benchmarks/bench_neo4j_counts.py --apps 10,100,500 --latency-ms 2 \\
+           --objects 100000 --scan-ns-per-node 50
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fake_neo4j import FakeNeo4jDriver, build_databases  # noqa: E402
+import LM_Validation  # noqa: E402
+
+
+def run(driver, tenants, batch_size, mode="scan", validate_sample=0):
+    driver.round_trips = 0
+    start = time.perf_counter()
+    counts = LM_Validation.fetch_neo4j_object_counts(
+        driver, tenants, batch_size=batch_size, mode=mode, validate_sample=validate_sample
+    )
+    return counts, driver.round_trips, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", default="10,100,500")
+    parser.add_argument("--tenants", default="neo4j,imaging")
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--objects", type=int, default=1000, help="live objects per application")
+    parser.add_argument("--deleted", type=int, default=10, help="deleted objects per application")
+    parser.add_argument("--scan-ns-per-node", type=float, default=0.0,
+                        help="simulated label scan cost per node")
+    parser.add_argument("--validate-sample", type=int, default=5)
+    args = parser.parse_args()
+
+    for name in ("LM_Validation", "neo4j_counts"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    tenants = args.tenants.split(",")
+
+    print(f"{'apps':>6} {'mode':>18} {'round trips':>12} {'seconds':>9}")
+    for n_apps in (int(n) for n in args.apps.split(",")):
+        driver = FakeNeo4jDriver(
+            build_databases(tenants, n_apps, args.objects, args.deleted),
+            latency=args.latency_ms / 1000, scan_seconds_per_node=args.scan_ns_per_node / 1e9
+        )
+        runs = [
+            ("loop", run(driver, tenants, None)),
+            ("batched", run(driver, tenants, args.batch_size)),
+            ("count_store", run(driver, tenants, args.batch_size, "count_store")),
+            ("count_store+check", run(driver, tenants, args.batch_size, "count_store", args.validate_sample)),
+        ]
+
+        expected = runs[0][1][0]
+        for mode, (counts, trips, elapsed) in runs:
+            if counts != expected:
+                raise SystemExit(f"Result mismatch at {n_apps} apps ({mode})")
+            print(f"{n_apps:>6} {mode:>18} {trips:>12} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
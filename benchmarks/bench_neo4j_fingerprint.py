@@ -0,0 +1,52 @@
+"""Records streamed by the bucketed object set comparison vs pulling every object key.
+
+Usage: python benchmarks/bench_neo4j_fingerprint.py --objects 1000,10000,100000 \\
+           --changed 10 --leaf-size 64
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_neo4j import FakeNeo4jDriver, build_databases  # noqa: E402
+from neo4j_counts import diff_neo4j_object_sets  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", default="1000,10000,100000", help="objects per application")
+    parser.add_argument("--apps", type=int, default=4)
+    parser.add_argument("--changed", type=int, default=10, help="objects added on V3 per application")
+    parser.add_argument("--leaf-size", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.getLogger("neo4j_counts").setLevel(logging.WARNING)
+    tenants = ["neo4j"]
+
+    print(f"{'objects':>8} {'all keys':>10} {'streamed':>10} {'round trips':>12} {'added':>7} {'seconds':>9}")
+    for objects in (int(n) for n in args.objects.split(",")):
+        v2 = build_databases(tenants, args.apps, objects)
+        v3 = build_databases(tenants, args.apps, objects + args.changed)
+        v2_driver, v3_driver = FakeNeo4jDriver(v2), FakeNeo4jDriver(v3)
+
+        start = time.perf_counter()
+        diff = diff_neo4j_object_sets(
+            {"V2": (v2_driver, tenants), "V3": (v3_driver, tenants)}, leaf_size=args.leaf_size
+        )
+        elapsed = time.perf_counter() - start
+
+        # Pulling every key of both sides is what a client-side set diff would transfer
+        all_keys = sum(spec[1] for db in (v2, v3) for apps in db.values() for spec in apps.values())
+        streamed = v2_driver.records_returned + v3_driver.records_returned
+        added = sum(len(result["added"]) for result in diff.values())
+        assert added == args.apps * args.changed
+        trips = v2_driver.round_trips + v3_driver.round_trips
+        print(f"{objects:>8} {all_keys:>10} {streamed:>10} {trips:>12} {added:>7} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure CLI startup time and check that starting up has no side effects.
+
+Each case runs in a fresh interpreter, from an empty temporary directory, and
+reports the median wall time over --runs runs, the heavy modules it loaded and
+any file it left behind.
+
+Usage: python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("pandas", "openpyxl", "psycopg2", "neo4j")
+
+PRELUDE = f"import sys; sys.path.insert(0, {ROOT!r})\n"
+REPORT = "\nprint(','.join(m for m in {modules!r} if m in sys.modules))\n"
+
+CASES = {
+    # argparse exits before any command module is imported
+    "cli --help": (
+        "import contextlib, io, cli\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        "        cli.main(['--help'])\n"
+        "    except SystemExit:\n"
+        "        pass"
+    ),
+    "import cli": "import cli",
+    # what variation and merge load before they run
+    "import LM_Validation": "import LM_Validation",
+    # v2, v3, shard, audit and object-diff add the drivers once they connect
+    "import LM_Validation + drivers": "import LM_Validation, psycopg2.pool, neo4j",
+}
+
+
+def run_case(code, workdir):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PRELUDE + code + REPORT.format(modules=HEAVY_MODULES)],
+        cwd=workdir, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    elapsed = time.perf_counter() - start
+    return elapsed, output.strip().splitlines()[-1] if output.strip() else ""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'case':<32} {'median s':>9} {'min s':>7}  {'heavy modules':<32} files created")
+    for name, code in CASES.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            # one untimed run, so every case starts with warm .pyc files
+            run_case(code, workdir)
+            for entry in os.listdir(workdir):
+                os.remove(os.path.join(workdir, entry))
+
+            timings = []
+            for _ in range(max(1, args.runs)):
+                elapsed, loaded = run_case(code, workdir)
+                timings.append(elapsed)
+            created = sorted(os.listdir(workdir))
+
+        print(
+            f"{name:<32} {statistics.median(timings):>9.3f} {min(timings):>7.3f}  "
+            f"{loaded or '-':<32} {', '.join(created) or 'none'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""In-process stand-in for the neo4j driver used by the benchmarks.
+
+Only the calls LM_Validation makes are supported: ``driver.session(database=...)``,
+``session.run(query, **params)`` and iterating / ``.single()`` on the result.
+Every ``session.run`` counts as one round trip and sleeps for ``latency`` seconds,
+plus ``scan_seconds_per_node`` for every node a label scan would touch (count
+store lookups touch none).
+FakeAsyncNeo4jDriver mirrors the async driver (``async with``, ``await session.run``,
+``async for``) and sleeps with ``asyncio.sleep`` so concurrent sessions overlap.
+"""
+import asyncio
+import hashlib
+import re
+import time
+
+LABEL_PATTERN = re.compile(r":Object:`((?:[^`]|``)+)`")
+COUNT_STORE_PATTERN = re.compile(r"\(n:`((?:[^`]|``)+)`\)")
+
+
+class FakeRecord(dict):
+    pass
+
+
+class FakeResult:
+    def __init__(self, records):
+        self._records = [FakeRecord(r) for r in records]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+
+class FakeSession:
+    def __init__(self, driver, database):
+        self.driver = driver
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        records, scanned = _answer(self.driver.databases.get(self.database, {}), query, params)
+        self.driver.round_trips += 1
+        self.driver.records_returned += len(records)
+        delay = self.driver.delay(scanned)
+        if delay:
+            time.sleep(delay)
+        return FakeResult(records)
+
+
+def _answer(apps, query, params):
+    # apps: {app_name: (display_name, live_objects[, deleted_objects[, non_object_nodes]])}
+    def sizes(name):
+        if name not in apps:
+            return 0, 0, 0
+        return (tuple(apps[name][1:]) + (0, 0))[:3]
+
+    # Returns (records, nodes a real server would scan to answer)
+    if "(n:Application)" in query:
+        return [
+            {"app_name": name, "consoleApp_name": spec[0]}
+            for name, spec in apps.items()
+        ], len(apps)
+
+    if "(d:Deleted)" in query:
+        return [
+            {"app_name": name, "cnt": sizes(name)[1]}
+            for name in params["app_names"] if sizes(name)[1]
+        ], sum(sizes(name)[1] for name in apps)
+
+    if "key_property" in params:
+        # Object set fingerprints: app X's live objects are keyed "X:0", "X:1", ...
+        records = []
+        parents = params["parents"]
+        for name in params["app_names"]:
+            buckets = {}
+            for i in range(sizes(name)[0]):
+                key = f"{name}:{i}"
+                h = hashlib.md5(key.encode()).hexdigest()
+                if parents is not None and not any(h.startswith(p) for p in parents[name]):
+                    continue
+                if "depth" not in params:
+                    records.append({"app_name": name, "key": key})
+                    continue
+                bucket = h[:params["depth"]]
+                cnt, hi, lo = buckets.get(bucket, (0, 0, 0))
+                buckets[bucket] = (cnt + 1, hi + int(h[16:24], 16), lo + int(h[24:32], 16))
+            records.extend(
+                {"app_name": name, "bucket": bucket, "cnt": cnt, "digest_hi": hi, "digest_lo": lo}
+                for bucket, (cnt, hi, lo) in buckets.items()
+            )
+        return records, sum(sum(sizes(name)) for name in apps)
+
+    if "type_property" in params:
+        # Histograms: live objects split over two object types, one CALL per object
+        records = []
+        for name in params["app_names"]:
+            live = sizes(name)[0]
+            if "type(r)" in query:
+                split = {"CALL": live}
+            else:
+                split = {"Program": live - live // 2, "Table": live // 2}
+            records.extend({"app_name": name, "type": type_, "cnt": cnt} for type_, cnt in split.items() if cnt)
+        return records, sum(sum(sizes(name)) for name in apps)
+
+    records = []
+    scanned = 0
+    for label in LABEL_PATTERN.findall(query):
+        name = label.replace("``", "`")
+        records.append({"app_name": name, "cnt": sizes(name)[0]})
+        scanned += sum(sizes(name))
+    for label in COUNT_STORE_PATTERN.findall(query):
+        name = label.replace("``", "`")
+        records.append({"app_name": name, "cnt": sum(sizes(name))})
+    return records, scanned
+
+
+class FakeNeo4jDriver:
+    def __init__(self, databases, latency=0.0, scan_seconds_per_node=0.0):
+        # databases: {db_name: {app_name: (display_name, object_count[, deleted[, non_object]])}}
+        self.databases = databases
+        self.latency = latency
+        self.scan_seconds_per_node = scan_seconds_per_node
+        self.round_trips = 0
+        self.records_returned = 0
+
+    def delay(self, scanned):
+        return self.latency + scanned * self.scan_seconds_per_node
+
+    def session(self, database=None):
+        return FakeSession(self, database)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncResult(FakeResult):
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self._records:
+            yield record
+
+
+class FakeAsyncSession(FakeSession):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, **params):
+        records, scanned = _answer(self.driver.databases.get(self.database, {}), query, params)
+        self.driver.round_trips += 1
+        self.driver.records_returned += len(records)
+        delay = self.driver.delay(scanned)
+        if delay:
+            await asyncio.sleep(delay)
+        return FakeAsyncResult(records)
+
+
+class FakeAsyncNeo4jDriver(FakeNeo4jDriver):
+    def session(self, database=None):
+        return FakeAsyncSession(self, database)
+
+    async def close(self):
+        pass
+
+
+def build_databases(tenants, apps_per_tenant, objects_per_app=1000, deleted_per_app=0):
+    return {
+        tenant: {
+            f"{tenant}_app_{i}": (f"{tenant}_app_{i}", objects_per_app + i, deleted_per_app)
+            for i in range(apps_per_tenant)
+        }
+        for tenant in tenants
+    }
@@ -0,0 +1,144 @@
+"""Build a synthetic CSS layout in a local PostgreSQL database for benchmarking.
+
+Creates aip_node.domain / application / connection_profile / snapshot and one
+bench{i}_central / _local / _mngt schema triplet per application, with the
+tables and columns the Queries.py statements read.
+
+Never point this at a real CSS database: it drops and recreates aip_node. As a
+safeguard it refuses to run when aip_node exists without its own marker table.
+"""
+
+MARKER_TABLE = "aip_node.synthetic_css_marker"
+TENANTS = ("neo4j", "imaging")
+
+
+def _reset(cursor):
+    cursor.execute("SELECT to_regclass('aip_node.application'), to_regclass(%s)", (MARKER_TABLE,))
+    application, marker = cursor.fetchone()
+    if application and not marker:
+        raise RuntimeError("aip_node exists and was not created by synthetic_css; refusing to drop it")
+
+    cursor.execute("SELECT nspname FROM pg_namespace WHERE nspname ~ '^bench[0-9]+_(central|local|mngt)$'")
+    for (schema,) in cursor.fetchall():
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+    cursor.execute("DROP SCHEMA IF EXISTS aip_node CASCADE")
+
+
+def _create_triplet(cursor, prefix, seed, objects):
+    central, local, mngt = f"{prefix}_central", f"{prefix}_local", f"{prefix}_mngt"
+    cursor.execute(f"""
+        CREATE SCHEMA {central};
+        CREATE SCHEMA {local};
+        CREATE SCHEMA {mngt};
+
+        CREATE TABLE {central}.dss_object_types (object_type_id int, object_group int);
+        CREATE TABLE {central}.dss_objects (object_id int, object_name text, object_type_id int);
+        CREATE TABLE {central}.dss_metric_results (
+            object_id int, metric_id int, metric_num_value double precision,
+            snapshot_id int, metric_value_index int
+        );
+        CREATE TABLE {central}.dss_metric_types (metric_id int, metric_name text);
+        CREATE TABLE {central}.adg_delta_snapshots (snapshot_id int, latest int);
+        CREATE TABLE {central}.dss_snapshots (snapshot_id int);
+        CREATE TABLE {central}.sys_package_version (package_name text);
+
+        INSERT INTO {central}.dss_object_types VALUES (1, 1), (2, 2), (-102, 0);
+        INSERT INTO {central}.dss_objects VALUES
+            (1, 'JEE', 2), (2, 'SQL', 2), (3, 'HTML5', 2), (4, 'Application', -102);
+        INSERT INTO {central}.dss_objects
+            SELECT 100 + g, 'obj_' || g, 1 FROM generate_series(1, {objects}) g;
+        INSERT INTO {central}.dss_metric_types VALUES (10151, 'Number of Code Lines'), (67011, 'Critical Violations');
+        INSERT INTO {central}.adg_delta_snapshots VALUES (1, 0), (2, 1);
+        INSERT INTO {central}.dss_snapshots VALUES (1), (2);
+
+        INSERT INTO {central}.dss_metric_results
+            SELECT o.object_id, m.metric_id, (o.object_id * 7 + {seed}) % 1000, s.snapshot_id, 0
+            FROM {central}.dss_objects o, (VALUES (10151), (10152), (10153)) m(metric_id),
+                 (VALUES (1), (2)) s(snapshot_id)
+            WHERE o.object_type_id = 1;
+        INSERT INTO {central}.dss_metric_results VALUES
+            (1, 10151, {40000 + seed * 13}, 2, 0),
+            (2, 10151, {9000 + seed * 3}, 2, 0),
+            (3, 10151, {seed % 5}, 2, 0),
+            (4, 67011, {seed % 40}, 2, 0),
+            (4, 67011, {seed % 40}, 1, 0);
+        INSERT INTO {central}.sys_package_version
+            SELECT '/com.castsoftware.ext' || g FROM generate_series(1, {5 + seed % 10}) g;
+        INSERT INTO {central}.sys_package_version VALUES ('core'), ('assessment');
+
+        CREATE TABLE {local}.acc (prop int);
+        CREATE TABLE {local}.cdt_objects (object_type_str text, object_fullname text);
+        CREATE TABLE {local}.dss_code_sources (source_id int, source_path text);
+        INSERT INTO {local}.acc SELECT (g % 9 = 0)::int FROM generate_series(1, {objects * 2}) g;
+        INSERT INTO {local}.cdt_objects
+            SELECT CASE WHEN g % 50 = 0 THEN 'Missing Table' ELSE 'Java Method' END,
+                   CASE WHEN g % 97 = 0 THEN 'Unknown.' || g ELSE 'com.app.Class' || g END
+            FROM generate_series(1, {objects}) g;
+        INSERT INTO {local}.dss_code_sources
+            SELECT g, '/src/file' || g FROM generate_series(1, {max(1, objects // 10)}) g;
+
+        CREATE TABLE {mngt}.cms_objectlinks (symbol text);
+        INSERT INTO {mngt}.cms_objectlinks
+            SELECT CASE WHEN g % 10 = 0 THEN 'afterTools' ELSE 'beforeTools' END
+            FROM generate_series(1, 50) g;
+    """)
+
+
+def build_css(connection, domains=5, apps_per_domain=10, default_apps=2, objects=5000, shared_every=0):
+    """Create the layout and return [(domain_guid, app_name, schema_prefix)].
+
+    shared_every > 0 makes that many consecutive applications share one schema
+    triplet, as happens with several applications on one connection profile.
+    """
+    cursor = connection.cursor()
+    _reset(cursor)
+
+    cursor.execute(f"""
+        CREATE SCHEMA aip_node;
+        CREATE TABLE {MARKER_TABLE} (created_at timestamp DEFAULT now());
+        INSERT INTO {MARKER_TABLE} DEFAULT VALUES;
+        CREATE TABLE aip_node.domain (guid text PRIMARY KEY, name text);
+        CREATE TABLE aip_node.connection_profile (guid text PRIMARY KEY, schema_prefix text);
+        CREATE TABLE aip_node.application (
+            guid text PRIMARY KEY, name text, domain_guid text, connection_profile_guid text
+        );
+        CREATE TABLE aip_node.snapshot (application_guid text, lines_of_code bigint);
+    """)
+
+    apps = []
+    for d in range(domains):
+        domain_guid = f"domain-{d:04d}"
+        cursor.execute("INSERT INTO aip_node.domain VALUES (%s, %s)", (domain_guid, f"Domain{d}"))
+        apps.extend((domain_guid, f"app_{d}_{a}") for a in range(apps_per_domain))
+    apps.extend((None, f"default_app_{a}") for a in range(default_apps))
+
+    created = set()
+    result = []
+    for i, (domain_guid, app_name) in enumerate(apps):
+        prefix = f"bench{i // shared_every if shared_every else i}"
+        cursor.execute(
+            "INSERT INTO aip_node.connection_profile VALUES (%s, %s)", (f"cp-{i}", prefix)
+        )
+        cursor.execute(
+            "INSERT INTO aip_node.application VALUES (%s, %s, %s, %s)",
+            (f"app-{i}", app_name, domain_guid, f"cp-{i}")
+        )
+        cursor.execute("INSERT INTO aip_node.snapshot VALUES (%s, %s)", (f"app-{i}", 50_000 + i * 17))
+
+        if prefix not in created:
+            _create_triplet(cursor, prefix, i, objects)
+            created.add(prefix)
+        result.append((domain_guid, app_name, prefix))
+
+    cursor.execute("ANALYZE")
+    connection.commit()
+    cursor.close()
+    return result
+
+
+def neo4j_databases(apps, objects=5000):
+    """Fake Neo4j tenants for the synthetic applications, split across TENANTS."""
+    databases = {tenant: {} for tenant in TENANTS}
+    for i, (_, app_name, _) in enumerate(apps):
+        databases[TENANTS[i % len(TENANTS)]][app_name] = (app_name, objects + i)
+    return databases
@@ -0,0 +1,142 @@
+import re
+from decimal import Decimal
+
+from logger import get_logger
+from query_audit import render_query
+from Queries import (
+    loc, loc_null, loc_per_tech, extension_count,
+    critical_violations, dlms, missing_code_db,
+    analyzed_files, missing_code, customized_jobs
+)
+
+logger = get_logger(__name__)
+
+# Bare table references in FROM / JOIN clauses (already-qualified names are left alone)
+TABLE_PATTERN = re.compile(r"\b(from|join)\s+([a-z_][a-z0-9_]*)\b(?!\.)", re.IGNORECASE)
+
+# (parameter, schema suffix, query, column count, key columns, value column, value type)
+SCHEMA_QUERIES = [
+    ("loc_per_tech", "central", loc_per_tech, 2, ("c1",), "c2", float),
+    ("extension_count", "central", extension_count, 1, (), "c1", int),
+    ("critical_violations", "central", critical_violations, 3, ("c1", "c2"), "c3", float),
+    ("dlms", "local", dlms, 1, (), "c1", int),
+    ("missing_code_db", "local", missing_code_db, 1, (), "c1", int),
+    ("analyzed_files", "local", analyzed_files, 1, (), "c1", int),
+    ("missing_code", "local", missing_code, 1, (), "c1", int),
+    ("customized_jobs", "mngt", customized_jobs, 1, (), "c1", int),
+]
+SCHEMA_PARAMETERS = {spec[0]: spec for spec in SCHEMA_QUERIES}
+
+
+def qualify(query, schema):
+    """Rewrite a Queries.py statement so every bare table name reads from `schema`."""
+    return TABLE_PATTERN.sub(lambda m: f"{m.group(1)} {schema}.{m.group(2)}", query)
+
+
+def _strip(query):
+    return query.strip().rstrip(";").strip()
+
+
+def _long_select(owner, parameter, body, columns, keys, value):
+    names = ", ".join(f"c{i}" for i in range(1, columns + 1))
+    key_exprs = [f"{key}::text" for key in keys] + ["NULL::text"] * (2 - len(keys))
+    return (
+        f"SELECT {owner} AS owner, '{parameter}' AS parameter, "
+        f"{key_exprs[0]} AS key1, {key_exprs[1]} AS key2, {value}::numeric AS value "
+        f"FROM ({body}) AS q({names})"
+    )
+
+
+def build_bulk_query(tasks, queries=None):
+    """Build one UNION ALL statement returning (owner, parameter, key1, key2, value) rows.
+
+    For `loc` the owner is the task's position in `tasks`; for every other
+    parameter it is the position of the schema prefix in the returned list,
+    so applications sharing a schema triplet are only queried once. `queries`
+    replaces statements by parameter name, as in SchemaQueryCache.
+    """
+    queries = queries or {}
+    schemas = list(dict.fromkeys(schema for _, _, schema, _ in tasks))
+    parts = []
+    params = []
+
+    for idx, (_, app_name, _, app_domain_guid) in enumerate(tasks):
+        if app_domain_guid is None:
+            parts.append(_long_select(idx, "loc", _strip(loc_null), 1, (), "c1"))
+            params.append(app_name)
+        else:
+            parts.append(_long_select(idx, "loc", _strip(loc), 1, (), "c1"))
+            params.extend((app_domain_guid, app_name))
+
+    for idx, schema in enumerate(schemas):
+        for parameter, suffix, query, columns, keys, value, _ in SCHEMA_QUERIES:
+            # Literal % in LIKE patterns must be escaped once parameters are bound
+            body = render_query(queries.get(parameter, query))
+            body = qualify(_strip(body), f"{schema}_{suffix}").replace("%", "%%")
+            parts.append(_long_select(idx, parameter, body, columns, keys, value))
+
+    return "\nUNION ALL\n".join(parts), params, schemas
+
+
+def _reshape(parameter, rows):
+    # Rebuild the exact fetchall() rows the per-application queries return
+    value_type = SCHEMA_PARAMETERS[parameter][6] if parameter in SCHEMA_PARAMETERS else int
+    reshaped = []
+
+    for key1, key2, value in rows:
+        value = value_type(value) if isinstance(value, Decimal) else value
+        if parameter == "loc_per_tech":
+            reshaped.append((key1, value))
+        elif parameter == "critical_violations":
+            reshaped.append((int(key1), key2, value))
+        else:
+            reshaped.append((value,))
+
+    return reshaped
+
+
+def collect_bulk(cursor, tasks, existing_schemas, queries=None):
+    """Collect a batch of tasks in one round trip; returns {task: metrics or None}."""
+    results = {}
+    runnable = []
+
+    for task in tasks:
+        sheet, app_name, schema, _ = task
+        missing = [
+            f"{schema}_{suffix}" for suffix in ("central", "local", "mngt")
+            if f"{schema}_{suffix}" not in existing_schemas
+        ]
+        if missing:
+            logger.warning(
+                f"[Domain={sheet} | App={app_name} | Schema={schema}] Skipping, missing schemas: {', '.join(missing)}"
+            )
+            results[task] = None
+        else:
+            runnable.append(task)
+
+    if not runnable:
+        return results
+
+    query, params, schemas = build_bulk_query(runnable, queries)
+    cursor.execute(query, params)
+
+    app_rows = {idx: [] for idx in range(len(runnable))}
+    schema_rows = {(idx, parameter): [] for idx in range(len(schemas)) for parameter in SCHEMA_PARAMETERS}
+    for owner, parameter, key1, key2, value in cursor.fetchall():
+        if parameter == "loc":
+            app_rows[owner].append((key1, key2, value))
+        else:
+            schema_rows[(owner, parameter)].append((key1, key2, value))
+
+    schema_index = {schema: idx for idx, schema in enumerate(schemas)}
+    for idx, task in enumerate(runnable):
+        owner = schema_index[task[2]]
+        metrics = {"loc": _reshape("loc", app_rows[idx])}
+        for parameter in SCHEMA_PARAMETERS:
+            metrics[parameter] = _reshape(parameter, schema_rows[(owner, parameter)])
+        results[task] = metrics
+
+    logger.info(
+        f"Bulk collected {len(runnable)} applications over {len(schemas)} schema triplets in one statement"
+    )
+    return results
@@ -0,0 +1,154 @@
+"""Non-interactive entry point.
+
+    python cli.py v2|v3|all [--jobs N] [--force] [--resume]
+    python cli.py variation [--workbook FILE]
+    python cli.py shard I/N | merge FILE... | audit | object-diff
+    python cli.py menu [--jobs N] [--force] [--resume]
+
+Only argparse and the logger are imported up front; LM_Validation, and with it
+pandas and openpyxl, is imported by the command that runs, and psycopg2 and the
+neo4j driver only once a command connects. `--help` and argument errors
+therefore return at once and create no files.
+"""
+import argparse
+import sys
+
+from app_inventory import parse_shard
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+WORKBOOK = "V3_Upgrade_Apps_Validation.xlsx"
+
+
+# ------------------ COMMANDS ------------------
+def cmd_v2(args):
+    import LM_Validation
+    LM_Validation.generate_report(args.jobs, args.force, args.resume)
+
+
+def cmd_v3(args):
+    import LM_Validation
+    LM_Validation.generate_report3(args.jobs, args.force, args.resume)
+
+
+def cmd_variation(args):
+    import LM_Validation
+    LM_Validation.calculate_variation_only_clean(args.workbook)
+
+
+def cmd_all(args):
+    import LM_Validation
+    run = LM_Validation.RunState(both_passes=True)
+    # With --resume both passes resume: V3 picks up after its own start marker, which a
+    # fresh (non-resumed) V2 pass would have removed with the rest of the journal
+    LM_Validation.generate_report(args.jobs, args.force, args.resume, run)
+    LM_Validation.generate_report3(args.jobs, args.force, args.resume, run)
+    LM_Validation.calculate_variation_only_clean(WORKBOOK)
+
+
+def cmd_menu(args):
+    import LM_Validation
+    LM_Validation.main_menu(args.jobs, args.force, args.resume)
+
+
+def cmd_shard(args):
+    import LM_Validation
+    LM_Validation.run_shard(args.shard, args.jobs, args.force, args.resume)
+
+
+def cmd_merge(args):
+    import LM_Validation
+    LM_Validation.merge_shards(args.files, args.workbook)
+
+
+def cmd_audit(args):
+    import LM_Validation
+    LM_Validation.run_query_audit()
+
+
+def cmd_object_diff(args):
+    import LM_Validation
+    LM_Validation.run_object_diff()
+
+# ------------------ ARGUMENTS ------------------
+def _collection_options(parser):
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="parallel application collectors (default: COLLECTION_JOBS from config.properties)"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="ignore the snapshot store and collect every application again"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="skip applications journaled by an interrupted pass"
+    )
+
+
+def _workbook_option(parser):
+    parser.add_argument(
+        "--workbook", default=WORKBOOK, metavar="FILE",
+        help=f"validation workbook (default: {WORKBOOK})"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="V2 vs V3 upgrade validation")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    for name, func, help_text in (
+        ("v2", cmd_v2, "collect V2 and write the validation workbook"),
+        ("v3", cmd_v3, "collect V3 and join it onto the V2 workbook"),
+        ("all", cmd_all, "V2, then V3 (shared PostgreSQL collection), then the variation"),
+        ("menu", cmd_menu, "open the interactive menu"),
+    ):
+        command = commands.add_parser(name, help=help_text, description=help_text)
+        _collection_options(command)
+        command.set_defaults(func=func)
+
+    command = commands.add_parser("variation", help="recompute the Variation column of the workbook")
+    _workbook_option(command)
+    command.set_defaults(func=cmd_variation)
+
+    command = commands.add_parser("shard", help="collect V2 and V3 for shard I of N into its partial result file")
+    command.add_argument("shard", type=parse_shard, metavar="I/N")
+    _collection_options(command)
+    command.set_defaults(func=cmd_shard)
+
+    command = commands.add_parser("merge", help="build the workbook, variation included, from shard files")
+    command.add_argument("files", nargs="+", metavar="FILE")
+    _workbook_option(command)
+    command.set_defaults(func=cmd_merge)
+
+    command = commands.add_parser("audit", help="audit the query plans on sampled schemas")
+    command.set_defaults(func=cmd_audit)
+
+    command = commands.add_parser("object-diff", help="compare the V2 and V3 Neo4j object sets")
+    command.set_defaults(func=cmd_object_diff)
+
+    return parser
+
+
+def main(argv=None, default_command=None):
+    """Run one command; argv without a command runs default_command, if given, with those options."""
+    if default_command:
+        argv = list(sys.argv[1:] if argv is None else argv)
+        if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+            argv.insert(0, default_command)
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        logger.warning(f"'{args.command}' interrupted")
+        return 130
+    except Exception:
+        logger.exception(f"'{args.command}' failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
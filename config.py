@@ -12,6 +12,39 @@ def load_config(file_path="config.properties"):
     return config["DEFAULT"]
 
 
+class LazyConfig:
+    """config.properties, read on first use rather than at import time.
+
+    Behaves like the section load_config returns; on_load(section) runs once,
+    right after the file is read.
+    """
+
+    def __init__(self, file_path="config.properties", on_load=None):
+        self._file_path = file_path
+        self._on_load = on_load
+        self._section = None
+
+    def _load(self):
+        if self._section is None:
+            section = load_config(self._file_path)
+            self._section = section
+            if self._on_load is not None:
+                self._on_load(section)
+        return self._section
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __contains__(self, key):
+        return key in self._load()
+
+
 
 # a="['wrew','wdee]"
 # print(list(a))
@@ -0,0 +1,100 @@
+import json
+import os
+
+from logger import get_logger
+from snapshot_store import json_default
+
+logger = get_logger(__name__)
+
+
+class RunJournal:
+    """Append-only JSON Lines journal of the applications completed by a run.
+
+    Each pass writes a start marker for its environment, then one line per
+    finished application, flushed to disk straight away. resume() returns the
+    applications recorded since the last start marker, so an interrupted pass
+    can carry on where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _write(self, record):
+        f = self._open()
+        f.write(json.dumps(record, default=json_default) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    def start(self, environment, shard=None):
+        """Mark the start of a pass; shard is (index, count) for a sharded run."""
+        # A new V2 pass starts a new validation: older entries no longer apply
+        if environment == "V2" and os.path.exists(self.path):
+            self.close()
+            os.remove(self.path)
+        record = {"event": "start", "environment": environment}
+        if shard is not None:
+            record["shard"] = list(shard)
+        self._write(record)
+
+    def append(self, environment, domain, app_name, schema, metrics, total_object_count, position=None):
+        """position is the application's place in the full inventory, for the shard merge."""
+        self._write({
+            "event": "app",
+            "environment": environment,
+            "domain": domain,
+            "app": app_name,
+            "schema": schema,
+            "position": position,
+            "metrics": metrics,
+            "total_object_count": total_object_count,
+        })
+
+    def _records(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # The last line of a killed run may be cut short
+                    logger.warning(f"Journal {self.path}: skipping unreadable line {number}")
+
+    def entries(self, environment):
+        """Return {(domain, app, schema): app record} written since environment's last start."""
+        completed = {}
+        for record in self._records():
+            if record.get("environment") != environment:
+                continue
+            if record["event"] == "start":
+                completed = {}
+            elif record["event"] == "app":
+                completed[(record["domain"], record["app"], record["schema"])] = record
+        return completed
+
+    def shard(self):
+        """(index, count) of the last sharded pass in the journal, or None."""
+        shard = None
+        for record in self._records():
+            if record["event"] == "start":
+                shard = tuple(record["shard"]) if "shard" in record else None
+        return shard
+
+    def resume(self, environment):
+        """Return {(domain, app, schema): (metrics, total_object_count)} for environment."""
+        return {
+            key: (record["metrics"], record["total_object_count"])
+            for key, record in self.entries(environment).items()
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,11 +1,130 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 
 # Generate timestamp string
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 LOG_FILE = f"V3_Upgrade_Validation_{timestamp}.log"
 
+_lock = threading.Lock()
+_loggers = []
+_handlers = []
+_listener = None
+_queue_handler = None
+_limits = []
+
+
+# ------------------ VOLUME LIMITS ------------------
+class TruncateFilter(logging.Filter):
+    """Cut messages longer than max_length characters; tracebacks are kept whole."""
+
+    def __init__(self, max_length):
+        super().__init__()
+        self.max_length = max_length
+
+    def filter(self, record):
+        if self.max_length <= 0:
+            return True
+        message = record.getMessage()
+        if len(message) > self.max_length:
+            record.msg = f"{message[:self.max_length]}... [{len(message) - self.max_length} chars truncated]"
+            record.args = None
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """At most `rate` INFO/DEBUG records per second and per logger, in bursts of up to `rate`.
+
+    Warnings and errors always pass. The number of records dropped is added
+    to the next record of the same logger that gets through.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, dropped = self._buckets.get(record.name, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[record.name] = (tokens, now, dropped + 1)
+                self.dropped += 1
+                return False
+            self._buckets[record.name] = (tokens - 1, now, 0)
+
+        if dropped:
+            record.msg = f"{record.getMessage()} [{dropped} earlier record(s) suppressed by the rate limit]"
+            record.args = None
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to the listener thread; INFO/DEBUG records are dropped when the queue is full.
+
+    Warnings and errors wait for room instead, so none of them is lost.
+    """
+
+    def __init__(self, handoff):
+        super().__init__(handoff)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Plain messages need no copy: nothing on the record changes once it is queued
+        if not record.args and not record.exc_info and not record.stack_info:
+            return record
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full; wait for room rather than lose the stop signal
+        self.queue.put(self._sentinel)
+
+# ------------------ HANDLERS ------------------
+def _output_handlers():
+    """The file and console handlers, shared by every logger."""
+    if not _handlers:
+        formatter = logging.Formatter(
+            "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+        )
+
+        # delay: the log file is only created once something is logged
+        file_handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=5_000_000,
+            backupCount=3,
+            delay=True
+        )
+        file_handler.setFormatter(formatter)
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        _handlers.extend([file_handler, console_handler])
+    return list(_handlers)
+
+
 def get_logger(name: str):
     logger = logging.getLogger(name)
 
@@ -15,21 +134,80 @@ def get_logger(name: str):
 
     logger.setLevel(logging.INFO)
 
-    formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-    )
+    with _lock:
+        handlers = [_queue_handler] if _queue_handler else _output_handlers()
+        for handler in handlers:
+            logger.addHandler(handler)
+        for log_filter in _limits:
+            logger.addFilter(log_filter)
+        _loggers.append(logger)
 
-    file_handler = RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=5_000_000,
-        backupCount=3
-    )
-    file_handler.setFormatter(formatter)
+    return logger
 
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+def configure_logging(asynchronous=True, queue_size=10000, max_length=2000, rate=200):
+    """Apply the LOG_* settings of config.properties to every logger of the tool.
 
-    return logger
+    With asynchronous set, loggers only put records on a queue of at most
+    queue_size entries; a listener thread formats them and writes the log
+    file and the console. max_length truncates long messages and rate limits
+    INFO records per logger and second (0 disables either).
+    """
+    global _listener, _queue_handler
+
+    with _lock:
+        outputs = _output_handlers()
+
+        if _listener:
+            _listener.stop()
+            _listener = _queue_handler = None
+
+        # Logger filters run once per record, before any handler or the queue
+        for logger in _loggers:
+            for log_filter in _limits:
+                logger.removeFilter(log_filter)
+        _limits[:] = [TruncateFilter(max_length), RateLimitFilter(rate)]
+
+        if asynchronous:
+            target = _queue_handler = BoundedQueueHandler(queue.Queue(maxsize=max(1, queue_size)))
+            _listener = _Listener(target.queue, *outputs, respect_handler_level=True)
+            _listener.start()
+            handlers = [target]
+        else:
+            handlers = outputs
+
+        for logger in _loggers:
+            logger.handlers = list(handlers)
+            for log_filter in _limits:
+                logger.addFilter(log_filter)
+
+
+def log_summary(logger, context, fields, level=logging.INFO):
+    """One record per application instead of one per query or result set.
+
+    The fields are also attached to the record as `summary`, for handlers that
+    want them structured.
+    """
+    text = " | ".join(f"{key}={value}" for key, value in fields.items())
+    logger.log(level, f"{context} {text}", extra={"summary": dict(fields)})
+
+
+def dropped_records():
+    """Records dropped so far by the rate limit and by a full queue."""
+    return {
+        "rate_limited": sum(f.dropped for f in _limits if isinstance(f, RateLimitFilter)),
+        "queue_full": _queue_handler.dropped if _queue_handler else 0,
+    }
+
+
+@atexit.register
+def flush_logging():
+    """Write out whatever is still queued; runs at exit."""
+    global _listener, _queue_handler
+
+    with _lock:
+        if _listener:
+            _listener.stop()
+            _listener = _queue_handler = None
+            for logger in _loggers:
+                logger.handlers = _output_handlers()
@@ -0,0 +1,362 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+REPORT_COLUMNS = ["App Name", "Parameters", "V2", "V3", "Variation"]
+
+TECH_SHEET = "LOC Per Technology"
+TECH_COLUMNS = ["Sheet", "App Name", "Technology", "V2 LOC", "V3 LOC", "Delta", "Delta %"]
+TECH_KEY = ["Sheet", "App Name", "Technology"]
+
+OBJECT_TYPE_SHEET = "Object Types"
+OBJECT_TYPE_COLUMNS = ["Sheet", "App Name", "Kind", "Type", "V2 Count", "V3 Count", "Delta", "Delta %"]
+OBJECT_TYPE_KEY = ["Sheet", "App Name", "Kind", "Type"]
+
+# Workbook reads and writes of the process, counted where they happen
+WORKBOOK_IO = {"loads": 0, "saves": 0}
+
+
+def _first(rows):
+    return rows[0][0] if rows else 0
+
+
+def _breakdown(rows):
+    return ", ".join(f"{tech}:{int(loc)}" for tech, loc in rows) if rows else 0
+
+
+def _critical(rows):
+    return rows[0][2] if rows else 0
+
+
+# (workbook label, metrics key, extractor), in report order
+PARAMETERS = [
+    ("Loc", "loc", _first),
+    ("Loc Per Tech", "loc_per_tech", _breakdown),
+    ("Extension Count", "extension_count", _first),
+    ("Dlms", "dlms", _first),
+    ("Missing Code Db", "missing_code_db", _first),
+    ("Analyzed Files", "analyzed_files", _first),
+    ("Missing Code", "missing_code", _first),
+    ("Dashboard - Critical Violations", "critical_violations", _critical),
+    ("Total Object Count", None, None),
+    ("Customized Jobs", "customized_jobs", _first),
+]
+PARAMETER_LABELS = [label for label, _, _ in PARAMETERS]
+
+
+def metric_values(metrics, total_object_count):
+    """One workbook value per parameter, straight from the query rows."""
+    return [
+        total_object_count if key is None else extract(metrics[key])
+        for _, key, extract in PARAMETERS
+    ]
+
+
+class ComparisonTable:
+    """Column-wise (sheet, app, key..., V2 value, V3 value) records for a long-format sheet.
+
+    Subclasses set SHEET, COLUMNS (key columns, V2 and V3 values, then
+    "Delta" and "Delta %") and KEY. keys holds one tuple per record with the
+    key columns after Sheet and App Name.
+    """
+
+    SHEET = None
+    COLUMNS = []
+    KEY = []
+
+    __slots__ = ("sheets", "apps", "keys", "v2", "v3")
+
+    def __init__(self):
+        self.sheets = []
+        self.apps = []
+        self.keys = []
+        self.v2 = []
+        self.v3 = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def value_columns(cls):
+        return cls.COLUMNS[len(cls.KEY):len(cls.KEY) + 2]
+
+    def _append(self, sheet, app_name, key, value, side):
+        self.sheets.append(sheet)
+        self.apps.append(app_name)
+        self.keys.append(key)
+        self.v2.append(value if side == "V2" else None)
+        self.v3.append(value if side == "V3" else None)
+
+    def frame(self):
+        v2_column, v3_column = self.value_columns()
+        columns = {"Sheet": self.sheets, "App Name": self.apps}
+        for position, name in enumerate(self.KEY[2:]):
+            columns[name] = [key[position] for key in self.keys]
+        columns[v2_column] = pd.Series(self.v2, dtype=object)
+        columns[v3_column] = pd.Series(self.v3, dtype=object)
+        return pd.DataFrame(columns)
+
+    @classmethod
+    def from_frame(cls, df):
+        v2_column, v3_column = cls.value_columns()
+        table = cls()
+        table.sheets = df["Sheet"].tolist()
+        table.apps = df["App Name"].tolist()
+        table.keys = list(zip(*(df[name].tolist() for name in cls.KEY[2:])))
+        table.v2 = df[v2_column].astype(object).where(df[v2_column].notna(), None).tolist()
+        table.v3 = df[v3_column].astype(object).where(df[v3_column].notna(), None).tolist()
+        return table
+
+    @classmethod
+    def matches(cls, title, header):
+        return title == cls.SHEET and list(header[:len(cls.KEY) + 2]) == cls.COLUMNS[:len(cls.KEY) + 2]
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Read-only rows stop at the last non-empty cell
+        width = len(cls.KEY) + 2
+        return cls.from_frame(pd.DataFrame(
+            [(list(row) + [None] * width)[:width] for row in rows], columns=cls.COLUMNS[:width]
+        ))
+
+    def join(self, v3_table):
+        """Full outer join of these V2 values with v3_table's V3 values on KEY."""
+        v2_column, v3_column = self.value_columns()
+        # A key can be listed twice; the last value wins, as before
+        v2 = self.frame()[self.KEY + [v2_column]].drop_duplicates(self.KEY, keep="last")
+        v3 = v3_table.frame()[self.KEY + [v3_column]].drop_duplicates(self.KEY, keep="last")
+        return type(self).from_frame(v2.merge(v3, on=self.KEY, how="outer"))
+
+    def report_frame(self):
+        """The comparison sheet.
+
+        A key missing on one side counts as 0 in the delta; apps without any
+        value on one side (not collected there) get no delta at all.
+        """
+        v2_column, v3_column = self.value_columns()
+        df = self.frame()
+        v2 = pd.to_numeric(df[v2_column], errors="coerce")
+        v3 = pd.to_numeric(df[v3_column], errors="coerce")
+        apps = [df["Sheet"], df["App Name"]]
+        compared = (
+            v2.notna().groupby(apps).transform("any")
+            & v3.notna().groupby(apps).transform("any")
+        )
+
+        delta = v3.fillna(0) - v2.fillna(0)
+        percent = (delta / v2.where(v2 != 0) * 100).round(2)
+        df["Delta"] = delta.astype("int64").astype(object).where(compared, None)
+        df["Delta %"] = percent.astype(object).where(compared & percent.notna(), None)
+        return df[self.COLUMNS]
+
+    def report_rows(self, chunk_size=10000):
+        """Yield (SHEET, rows) in chunks, for the workbook writers."""
+        rows = self.report_frame().values.tolist()
+        for start in range(0, len(rows), chunk_size):
+            yield self.SHEET, rows[start:start + chunk_size]
+
+
+class TechLocTable(ComparisonTable):
+    """(sheet, app, technology) LOC records.
+
+    Filled from the loc_per_tech rows themselves, so the comparison never goes
+    through the "tech:loc, tech:loc" workbook string.
+    """
+
+    SHEET = TECH_SHEET
+    COLUMNS = TECH_COLUMNS
+    KEY = TECH_KEY
+
+    __slots__ = ()
+
+    def add(self, sheet, app_name, rows, side="V2"):
+        for tech, loc in rows:
+            self._append(sheet, app_name, (tech,), int(loc), side)
+
+
+class ObjectTypeTable(ComparisonTable):
+    """(sheet, app, kind, type) Neo4j counts from the object type histograms."""
+
+    SHEET = OBJECT_TYPE_SHEET
+    COLUMNS = OBJECT_TYPE_COLUMNS
+    KEY = OBJECT_TYPE_KEY
+
+    __slots__ = ()
+
+    def add(self, sheet, app_name, rows, side="V2"):
+        for kind, type_, count in rows:
+            self._append(sheet, app_name, (kind, type_), int(count), side)
+
+
+# MetricTable attribute -> long-format comparison table
+COMPARISON_TABLES = {"techs": TechLocTable, "object_types": ObjectTypeTable}
+
+
+class MetricTable:
+    """Column-wise (sheet, app, parameter, V2, V3, Variation) records of a whole run.
+
+    One list per column instead of one dict per workbook row; rows of an
+    application are contiguous and in PARAMETERS order when built by add().
+    """
+
+    __slots__ = (
+        "sheets", "apps", "parameters", "v2", "v3", "variation", "extras",
+        "techs", "object_types", "extra_sheets", "extra_columns", "sheet_order"
+    )
+
+    def __init__(self):
+        self.sheets = []
+        self.apps = []
+        self.parameters = []
+        self.v2 = []
+        self.v3 = []
+        self.variation = []
+        # Values of user-added columns, per row (None for rows built by add())
+        self.extras = []
+        self.techs = TechLocTable()
+        self.object_types = ObjectTypeTable()
+        # Workbook sheets without V2 / V3 columns, kept verbatim
+        self.extra_sheets = {}
+        # Per sheet, the user-added column headers after REPORT_COLUMNS
+        self.extra_columns = {}
+        # Sheet titles in the order of the workbook the table was read from
+        self.sheet_order = []
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def add(self, sheet, app_name, metrics, total_object_count, side="V2"):
+        values = metric_values(metrics, total_object_count)
+        empty = [None] * len(values)
+
+        self.sheets.extend([sheet] * len(values))
+        self.apps.extend([app_name] * len(values))
+        self.parameters.extend(PARAMETER_LABELS)
+        self.v2.extend(values if side == "V2" else empty)
+        self.v3.extend(values if side == "V3" else empty)
+        self.variation.extend(empty)
+        self.extras.extend([None] * len(values))
+        self.techs.add(sheet, app_name, metrics["loc_per_tech"], side)
+        self.object_types.add(sheet, app_name, metrics.get("object_types", ()), side)
+
+    def comparisons(self):
+        return [getattr(self, name) for name in COMPARISON_TABLES]
+
+    def frame(self):
+        return pd.DataFrame({
+            "sheet": self.sheets,
+            "App Name": self.apps,
+            "Parameters": self.parameters,
+            "V2": pd.Series(self.v2, dtype=object),
+            "V3": pd.Series(self.v3, dtype=object),
+            "Variation": pd.Series(self.variation, dtype=object),
+        })
+
+    def rows(self, start, end, repeat_app=False):
+        """Workbook rows start..end-1 in REPORT_COLUMNS order, then any user-added columns."""
+        return [
+            [
+                self.apps[i] if repeat_app or i == start or self.apps[i] != self.apps[i - 1] else "",
+                self.parameters[i], self.v2[i], self.v3[i], self.variation[i],
+                *(self.extras[i] or ())
+            ]
+            for i in range(start, end)
+        ]
+
+    def app_rows(self, repeat_app=False):
+        """Yield (sheet, rows) per application, in table order."""
+        start = 0
+        for end in range(1, len(self) + 1):
+            if end < len(self) and (self.sheets[end], self.apps[end]) == (self.sheets[start], self.apps[start]):
+                continue
+            yield self.sheets[start], self.rows(start, end, repeat_app)
+            start = end
+
+    def index(self):
+        """Map (sheet, app, parameter) to the positions holding it."""
+        index = {}
+        for position, key in enumerate(zip(self.sheets, self.apps, self.parameters)):
+            index.setdefault(key, []).append(position)
+        return index
+
+    @classmethod
+    def from_workbook(cls, excel_file):
+        table = cls()
+        wb = load_workbook(excel_file, read_only=True)
+        WORKBOOK_IO["loads"] += 1
+
+        for ws in wb.worksheets:
+            table.sheet_order.append(ws.title)
+            rows = ws.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            comparison = next(
+                (name for name, cls in COMPARISON_TABLES.items() if cls.matches(ws.title, header)), None
+            )
+            if comparison is not None:
+                setattr(table, comparison, COMPARISON_TABLES[comparison].from_rows(rows))
+                continue
+            if "V2" not in header or "V3" not in header:
+                table.extra_sheets[ws.title] = [header] + [list(row) for row in rows]
+                continue
+
+            columns = [header.index(name) if name in header else None for name in REPORT_COLUMNS]
+            # Columns the tool does not write itself are carried through unchanged
+            extra = [i for i, name in enumerate(header) if name not in REPORT_COLUMNS]
+            if extra:
+                table.extra_columns[ws.title] = [header[i] for i in extra]
+            app = None
+            for row in rows:
+                value = [row[i] if i is not None and i < len(row) else None for i in columns]
+                table.extras.append([row[i] if i < len(row) else None for i in extra] or None)
+                # Only the first row of an application carries its name
+                app = value[0] if value[0] not in (None, "") else app
+                table.sheets.append(ws.title)
+                table.apps.append(app)
+                table.parameters.append(value[1])
+                table.v2.append(value[2])
+                table.v3.append(value[3])
+                table.variation.append(value[4])
+
+        wb.close()
+        return table
+
+
+UNMATCHED_SHEET = "Unmatched Keys"
+UNMATCHED_COLUMNS = ["Side", "Sheet", "App Name", "Parameters", "Value"]
+
+
+def join_v3(table, v3_table):
+    """Hash-join V3 results onto the V2 rows of `table` by (sheet, app, parameter).
+
+    Every V2 row whose key has a V3 result gets that value; nothing is matched
+    by position. Returns (matched keys, V2-only positions in table, V3-only
+    positions in v3_table).
+    """
+    v3_values = {}
+    for position, key in enumerate(zip(v3_table.sheets, v3_table.apps, v3_table.parameters)):
+        v3_values[key] = position
+
+    matched = set()
+    v2_only = []
+    for position, key in enumerate(zip(table.sheets, table.apps, table.parameters)):
+        v3_position = v3_values.get(key)
+        if v3_position is None:
+            v2_only.append(position)
+            continue
+        table.v3[position] = v3_table.v3[v3_position]
+        matched.add(key)
+
+    v3_only = [position for key, position in v3_values.items() if key not in matched]
+    return len(matched), v2_only, v3_only
+
+
+def unmatched_rows(table, v2_only, v3_table, v3_only):
+    rows = [UNMATCHED_COLUMNS]
+    rows.extend(
+        ["V2 only", table.sheets[i], table.apps[i], table.parameters[i], table.v2[i]]
+        for i in v2_only
+    )
+    rows.extend(
+        ["V3 only", v3_table.sheets[i], v3_table.apps[i], v3_table.parameters[i], v3_table.v3[i]]
+        for i in v3_only
+    )
+    return rows
@@ -0,0 +1,588 @@
+import asyncio
+from collections import Counter
+
+from logger import get_logger
+from profiler import profiler
+from Queries import neo4j_applications
+
+logger = get_logger(__name__)
+
+COUNT_MODES = ("scan", "count_store")
+
+# Deleted objects are few, so one scan of the Deleted label covers every application
+DELETED_COUNT_QUERY = """
+                MATCH (d:Deleted)
+                UNWIND labels(d) AS label
+                WITH label WHERE label IN $app_names
+                RETURN label AS app_name, count(*) AS cnt
+                """
+
+
+# Per-application histograms, aggregated server-side in one pass over the
+# tenant's Object nodes; only (application, type, count) rows are streamed back
+OBJECT_TYPE_HISTOGRAM_QUERY = """
+                MATCH (o:Object)
+                WHERE NOT 'Deleted' IN labels(o)
+                UNWIND labels(o) AS app_name
+                WITH o, app_name WHERE app_name IN $app_names
+                RETURN app_name, coalesce(toString(o[$type_property]), '') AS type, count(*) AS cnt
+                """
+
+RELATIONSHIP_TYPE_HISTOGRAM_QUERY = """
+                MATCH (o:Object)
+                WHERE NOT 'Deleted' IN labels(o)
+                UNWIND labels(o) AS app_name
+                WITH o, app_name WHERE app_name IN $app_names
+                MATCH (o)-[r]->()
+                RETURN app_name, type(r) AS type, count(*) AS cnt
+                """
+
+
+def _cypher_label(name):
+    # Labels cannot be passed as query parameters, so quote them instead
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def build_batched_count_query(app_names):
+    # One label-scan sub-query per application, answered in a single round trip
+    parts = [
+        f"""MATCH (o:Object:{_cypher_label(app_name)})
+                WHERE NOT 'Deleted' IN labels(o)
+                RETURN $app_names[{idx}] AS app_name, count(o) AS cnt"""
+        for idx, app_name in enumerate(app_names)
+    ]
+    return "CALL {\n" + "\nUNION ALL\n".join(parts) + "\n}\nRETURN app_name, cnt"
+
+
+def build_app_count_query(app_name):
+    return f"""
+                MATCH (o:Object:{_cypher_label(app_name)})
+                WHERE NOT 'Deleted' IN labels(o)
+                RETURN count(o) AS cnt
+                """
+
+
+def build_label_count_query(app_names):
+    # Single-label counts are answered from the count store without touching nodes,
+    # provided count() is the only projection: the name is attached after aggregating
+    parts = [
+        f"""MATCH (n:{_cypher_label(app_name)})
+                WITH count(n) AS cnt
+                RETURN $app_names[{idx}] AS app_name, cnt"""
+        for idx, app_name in enumerate(app_names)
+    ]
+    return "CALL {\n" + "\nUNION ALL\n".join(parts) + "\n}\nRETURN app_name, cnt"
+
+
+def _select_applications(records, app_names):
+    return [
+        (record["app_name"], record["consoleApp_name"])
+        for record in records
+        if record["app_name"]
+        and (app_names is None or record["consoleApp_name"] in app_names)
+    ]
+
+
+def _add_counts(app_object_counts, applications, counts):
+    # Several tenants may hold the same console application: counts are summed
+    for app_name, capp_name in applications:
+        app_object_counts[capp_name] = (
+            app_object_counts.get(capp_name, 0) + counts.get(app_name, 0)
+        )
+
+
+def _add_histograms(app_histograms, applications, histograms):
+    # Summed over tenants like the counts
+    for app_name, capp_name in applications:
+        totals = app_histograms.setdefault(capp_name, {})
+        for key, count in histograms.get(app_name, {}).items():
+            totals[key] = totals.get(key, 0) + count
+
+
+def _histogram_rows(app_histograms):
+    """{DisplayName: [[kind, type, count], ...]} sorted by kind and type."""
+    return {
+        capp_name: [[kind, type_, count] for (kind, type_), count in sorted(totals.items())]
+        for capp_name, totals in app_histograms.items()
+    }
+
+
+def histogram_object_totals(histograms):
+    """{DisplayName: live object count} from histogram rows: the sum of the Object kind.
+
+    The histogram query matches the same live Object nodes as the scan, so the
+    sum equals the scan total and makes a separate count query unnecessary.
+    """
+    return {
+        capp_name: sum(count for kind, _, count in rows if kind == "Object")
+        for capp_name, rows in histograms.items()
+    }
+
+
+def _batches(app_names, batch_size):
+    unique_names = list(dict.fromkeys(app_names))
+    for start in range(0, len(unique_names), batch_size):
+        yield unique_names[start:start + batch_size]
+
+
+def _sample(app_names, size):
+    # Evenly spread over the tenant, so the check does not only see one end of it
+    if size >= len(app_names):
+        return list(app_names)
+    step = len(app_names) / size
+    return [app_names[int(i * step)] for i in range(size)]
+
+# ------------------ TENANT COUNTING ------------------
+# The plans below yield (query name, query, params, application) and receive
+# the records, so the synchronous and async collectors share one implementation.
+def _scan_plan(app_names, batch_size):
+    counts = {}
+
+    if batch_size:
+        for batch in _batches(app_names, batch_size):
+            records = yield "total_object_count_batched", build_batched_count_query(batch), {"app_names": batch}, None
+            counts.update({record["app_name"]: record["cnt"] for record in records})
+    else:
+        for app_name in dict.fromkeys(app_names):
+            records = yield "total_object_count", build_app_count_query(app_name), {}, app_name
+            counts[app_name] = records[0]["cnt"] if records else 0
+
+    return counts
+
+
+def _count_store_plan(app_names, batch_size):
+    """Return live object counts as label counts minus Deleted nodes.
+
+    That holds only for applications whose label sits on Object nodes alone,
+    which the count store cannot tell (counting Object:label is a label scan,
+    as costly as the scan mode); _tenant_plan checks it on a sample.
+    """
+    label_counts = {}
+    for batch in _batches(app_names, batch_size or 100):
+        records = yield "label_counts", build_label_count_query(batch), {"app_names": batch}, None
+        label_counts.update({record["app_name"]: record["cnt"] for record in records})
+
+    records = yield "deleted_counts", DELETED_COUNT_QUERY, {"app_names": list(dict.fromkeys(app_names))}, None
+    deleted = {record["app_name"]: record["cnt"] for record in records}
+
+    return {
+        app_name: label_counts.get(app_name, 0) - deleted.get(app_name, 0)
+        for app_name in app_names
+    }
+
+
+def _tenant_plan(db, applications, batch_size, mode, validate_sample):
+    app_names = [app_name for app_name, _ in applications]
+
+    if mode == "count_store" and app_names:
+        counts = yield from _count_store_plan(app_names, batch_size)
+        if not validate_sample:
+            return counts
+
+        # Application labels on other nodes, or objects shared by applications,
+        # show up as a difference on the sampled applications
+        unique_names = list(dict.fromkeys(app_names))
+        sample = _sample(unique_names, validate_sample)
+        scanned = yield from _scan_plan(sample, batch_size)
+        mismatches = {
+            app_name: (counts[app_name], scanned.get(app_name, 0))
+            for app_name in sample
+            if counts[app_name] != scanned.get(app_name, 0)
+        }
+        if not mismatches:
+            logger.info(f"[Neo4j DB={db}] Count store totals match the scan on {len(sample)} sampled applications")
+            return counts
+
+        logger.warning(
+            f"[Neo4j DB={db}] Count store totals differ from the scan for "
+            f"{len(mismatches)}/{len(sample)} sampled applications "
+            f"(count store, scan): {mismatches}; falling back to label scans"
+        )
+        # The sampled applications are already scanned
+        rest = [app_name for app_name in unique_names if app_name not in scanned]
+        counts = yield from _scan_plan(rest, batch_size)
+        return dict(scanned, **counts)
+
+    return (yield from _scan_plan(app_names, batch_size))
+
+
+def _histogram_plan(applications, type_property, relationships):
+    """Return {application: {(kind, type): count}} for the tenant's applications."""
+    app_names = list(dict.fromkeys(app_name for app_name, _ in applications))
+    histograms = {}
+    if not app_names:
+        return histograms
+
+    queries = [("Object", "object_type_histogram", OBJECT_TYPE_HISTOGRAM_QUERY)]
+    if relationships:
+        queries.append(("Relationship", "relationship_type_histogram", RELATIONSHIP_TYPE_HISTOGRAM_QUERY))
+
+    for kind, name, query in queries:
+        records = yield name, query, {"app_names": app_names, "type_property": type_property}, None
+        for record in records:
+            histograms.setdefault(record["app_name"], {})[(kind, record["type"])] = record["cnt"]
+
+    return histograms
+
+
+def _applications_plan(app_names):
+    records = yield "applications", neo4j_applications, {}, None
+    return _select_applications(records, app_names)
+
+
+def _run_plan(session, db, plan):
+    try:
+        name, query, params, app_name = next(plan)
+        while True:
+            with profiler.app(app_name):
+                records = profiler.run_cypher(session, db, name, query, params)
+            name, query, params, app_name = plan.send(records)
+    except StopIteration as done:
+        return done.value
+
+
+async def _run_plan_async(session, db, plan):
+    try:
+        # Tasks share the profiler thread, so no per-application attribution here
+        name, query, params, _ = next(plan)
+        while True:
+            records = await profiler.run_cypher_async(session, db, name, query, params)
+            name, query, params, _ = plan.send(records)
+    except StopIteration as done:
+        return done.value
+
+# ------------------ SYNCHRONOUS COLLECTION ------------------
+def fetch_neo4j_object_counts(driver, database_names, batch_size=None, app_names=None,
+                              mode="scan", validate_sample=0):
+    """Return {DisplayName: live object count} summed over database_names.
+
+    mode "count_store" derives the totals from label counts and falls back to
+    label scans per tenant when that is not applicable; validate_sample > 0
+    cross-checks it against the scan on that many applications per tenant.
+    """
+    logger.info(f"Fetching Neo4j object counts ({mode})")
+    app_object_counts = {}
+
+    for db in database_names:
+        logger.info(f"[Neo4j DB={db}] Processing")
+
+        with driver.session(database=db) as session:
+            applications = _run_plan(session, db, _applications_plan(app_names))
+            counts = _run_plan(session, db, _tenant_plan(
+                db, applications, batch_size, mode, validate_sample
+            ))
+            _add_counts(app_object_counts, applications, counts)
+
+    logger.info("Neo4j object count collection completed")
+    return app_object_counts
+
+def fetch_neo4j_histograms(driver, database_names, app_names=None, type_property="Type",
+                           relationships=False):
+    """Return {DisplayName: [[kind, type, count], ...]} summed over database_names.
+
+    kind is "Object" (live objects per value of their `type_property`
+    property) or, with relationships, "Relationship" (outgoing relationships
+    of those objects per relationship type). Each tenant answers with one
+    aggregating query per kind.
+    """
+    logger.info("Fetching Neo4j object type histograms")
+    app_histograms = {}
+
+    for db in database_names:
+        logger.info(f"[Neo4j DB={db}] Processing")
+
+        with driver.session(database=db) as session:
+            applications = _run_plan(session, db, _applications_plan(app_names))
+            histograms = _run_plan(session, db, _histogram_plan(applications, type_property, relationships))
+            _add_histograms(app_histograms, applications, histograms)
+
+    logger.info("Neo4j object type histogram collection completed")
+    return _histogram_rows(app_histograms)
+
+# ------------------ ASYNCHRONOUS COLLECTION ------------------
+async def _tenant_async(driver, db, app_names, semaphore, tenant_plan):
+    async with semaphore:
+        logger.info(f"[Neo4j DB={db}] Processing")
+
+        async with driver.session(database=db) as session:
+            applications = await _run_plan_async(session, db, _applications_plan(app_names))
+            result = await _run_plan_async(session, db, tenant_plan(db, applications))
+
+        return applications, result
+
+
+async def _collect_async(endpoints, connect, concurrency, app_names, tenant_plan):
+    """Run tenant_plan on every tenant of every endpoint, at most `concurrency` at once.
+
+    Returns [(environment, applications, result)] in configuration order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    drivers = {
+        environment: connect(uri, user, password)
+        for environment, (uri, user, password, _) in endpoints.items()
+    }
+
+    try:
+        jobs = [
+            (environment, _tenant_async(drivers[environment], db, app_names, semaphore, tenant_plan))
+            for environment, (_, _, _, databases) in endpoints.items()
+            for db in databases
+        ]
+        results = await asyncio.gather(*(job for _, job in jobs))
+    finally:
+        await asyncio.gather(*(driver.close() for driver in drivers.values()))
+
+    # gather() keeps submission order, so tenants are summed in configuration order
+    return [
+        (environment, applications, result)
+        for (environment, _), (applications, result) in zip(jobs, results)
+    ]
+
+
+async def fetch_neo4j_object_counts_async(endpoints, connect, batch_size=None, concurrency=4,
+                                          app_names=None, mode="scan", validate_sample=0):
+    """Count objects on every tenant of every endpoint concurrently.
+
+    endpoints maps an environment ("V2", "V3") to (uri, user, password, databases);
+    connect(uri, user, password) returns an async driver. At most `concurrency`
+    tenants are queried at once. Returns {environment: {DisplayName: count}}.
+    """
+    logger.info(
+        f"Fetching Neo4j object counts ({mode}) for {', '.join(endpoints)} "
+        f"(up to {concurrency} tenants at once)"
+    )
+
+    def tenant_plan(db, applications):
+        return _tenant_plan(db, applications, batch_size, mode, validate_sample)
+
+    object_counts = {environment: {} for environment in endpoints}
+    for environment, applications, counts in await _collect_async(
+        endpoints, connect, concurrency, app_names, tenant_plan
+    ):
+        _add_counts(object_counts[environment], applications, counts)
+
+    logger.info("Neo4j object count collection completed")
+    return object_counts
+
+
+async def fetch_neo4j_histograms_async(endpoints, connect, concurrency=4, app_names=None,
+                                       type_property="Type", relationships=False):
+    """fetch_neo4j_histograms over every endpoint concurrently; returns {environment: histograms}."""
+    logger.info(
+        f"Fetching Neo4j object type histograms for {', '.join(endpoints)} "
+        f"(up to {concurrency} tenants at once)"
+    )
+
+    def tenant_plan(db, applications):
+        return _histogram_plan(applications, type_property, relationships)
+
+    app_histograms = {environment: {} for environment in endpoints}
+    for environment, applications, histograms in await _collect_async(
+        endpoints, connect, concurrency, app_names, tenant_plan
+    ):
+        _add_histograms(app_histograms[environment], applications, histograms)
+
+    logger.info("Neo4j object type histogram collection completed")
+    return {environment: _histogram_rows(rows) for environment, rows in app_histograms.items()}
+
+# ------------------ OBJECT SET FINGERPRINTS ------------------
+# Objects are keyed by one property and hashed with apoc.util.md5. A bucket is
+# a prefix of the hex hash, so every bucket splits into 16 children one digit
+# deeper. Its digest is the object count plus the sums of hex digits 16-23 and
+# 24-31 read as integers: order-independent, and additive across tenants.
+# Sums of 32-bit values cannot overflow Neo4j's 64-bit integers below 2^31
+# objects per bucket.
+FINGERPRINT_FIRST_DEPTH = 2
+FINGERPRINT_MAX_DEPTH = 16
+
+
+def _hex_value(hash_expr, start):
+    # Cypher has no hex parsing: each digit's value is its offset in the digit string
+    return (
+        f"reduce(v = 0, c IN split(substring({hash_expr}, {start}, 8), '') | "
+        f"v * 16 + size(split('0123456789abcdef', c)[0]))"
+    )
+
+
+# $parents maps an application to the buckets being refined (all objects when null)
+_OBJECT_HASHES = """
+                MATCH (o:Object)
+                WHERE NOT 'Deleted' IN labels(o)
+                UNWIND labels(o) AS app_name
+                WITH o, app_name WHERE app_name IN $app_names
+                WITH app_name, coalesce(toString(o[$key_property]), '') AS key
+                WITH app_name, key, toLower(apoc.util.md5([key])) AS h
+                WHERE $parents IS NULL OR any(p IN $parents[app_name] WHERE h STARTS WITH p)"""
+
+FINGERPRINT_BUCKET_QUERY = _OBJECT_HASHES + """
+                RETURN app_name, substring(h, 0, $depth) AS bucket, count(*) AS cnt,
+                       sum(""" + _hex_value("h", 16) + """) AS digest_hi,
+                       sum(""" + _hex_value("h", 24) + """) AS digest_lo
+                """
+
+FINGERPRINT_MEMBERS_QUERY = _OBJECT_HASHES + """
+                RETURN app_name, key
+                """
+
+
+def _fingerprint_plan(applications, key_property, depth, parents):
+    """Return {application: {bucket: (objects, digest_hi, digest_lo)}} for the tenant.
+
+    parents is None for the first level, else {DisplayName: [bucket]} to split
+    one hex digit further (depth is the child bucket length).
+    """
+    selected = _selected_buckets(applications, parents)
+    if not selected:
+        return {}
+
+    params = {
+        "app_names": list(selected), "key_property": key_property,
+        "depth": depth, "parents": None if parents is None else selected,
+    }
+    records = yield "fingerprint_buckets", FINGERPRINT_BUCKET_QUERY, params, None
+
+    fingerprints = {}
+    for record in records:
+        fingerprints.setdefault(record["app_name"], {})[record["bucket"]] = (
+            record["cnt"], record["digest_hi"], record["digest_lo"]
+        )
+    return fingerprints
+
+
+def _members_plan(applications, key_property, buckets):
+    """Return {application: [object key]} for the buckets listed in buckets[DisplayName]."""
+    selected = _selected_buckets(applications, buckets)
+    if not selected:
+        return {}
+
+    params = {"app_names": list(selected), "key_property": key_property, "parents": selected}
+    records = yield "fingerprint_members", FINGERPRINT_MEMBERS_QUERY, params, None
+
+    members = {}
+    for record in records:
+        members.setdefault(record["app_name"], []).append(record["key"])
+    return members
+
+
+def _selected_buckets(applications, buckets):
+    # Tenant labels of the applications that have buckets (every application when None)
+    if buckets is None:
+        return {app_name: None for app_name, _ in applications}
+    return {
+        app_name: sorted(buckets[capp_name])
+        for app_name, capp_name in applications
+        if buckets.get(capp_name)
+    }
+
+
+def _add_fingerprints(app_fingerprints, applications, fingerprints):
+    # Digests are sums, so the buckets of an application spread over tenants add up
+    for app_name, capp_name in applications:
+        totals = app_fingerprints.setdefault(capp_name, {})
+        for bucket, values in fingerprints.get(app_name, {}).items():
+            previous = totals.get(bucket, (0, 0, 0))
+            totals[bucket] = tuple(a + b for a, b in zip(previous, values))
+
+
+def _tenants(endpoints):
+    for environment, (driver, databases) in endpoints.items():
+        for db in databases:
+            yield environment, driver, db
+
+
+def diff_neo4j_object_sets(endpoints, app_names=None, key_property="FullName", leaf_size=64):
+    """Compare the object sets of every application between two Neo4j servers.
+
+    endpoints maps "V2" and "V3" to (driver, databases). Every tenant returns
+    one digest per (application, bucket) of 256 hash buckets; buckets whose
+    digests differ are split one hex digit further, level by level, until
+    they hold at most `leaf_size` objects. Only the members of those leaf
+    buckets are streamed, so the transfer grows with the difference rather
+    than with the applications. Returns {DisplayName: {"V2": objects,
+    "V3": objects, "buckets": differing leaf buckets, "added": [keys],
+    "removed": [keys]}}; keys listed twice on one side count twice.
+    """
+    logger.info(f"Fingerprinting Neo4j object sets (leaf buckets of up to {leaf_size} objects)")
+    tenant_applications = {}
+    totals = {environment: {} for environment in endpoints}
+
+    def level(depth, parents):
+        fingerprints = {environment: {} for environment in endpoints}
+        for environment, driver, db in _tenants(endpoints):
+            with driver.session(database=db) as session:
+                if (environment, db) not in tenant_applications:
+                    tenant_applications[environment, db] = _run_plan(
+                        session, db, _applications_plan(app_names)
+                    )
+                applications = tenant_applications[environment, db]
+                if parents is not None and not any(capp_name in parents for _, capp_name in applications):
+                    continue
+                _add_fingerprints(
+                    fingerprints[environment], applications,
+                    _run_plan(session, db, _fingerprint_plan(applications, key_property, depth, parents))
+                )
+        return fingerprints["V2"], fingerprints["V3"]
+
+    leaves = {}
+    parents = None
+    depth = FINGERPRINT_FIRST_DEPTH
+    while True:
+        v2, v3 = level(depth, parents)
+        if parents is None:
+            for environment, fingerprints in (("V2", v2), ("V3", v3)):
+                totals[environment] = {
+                    capp_name: sum(values[0] for values in buckets.values())
+                    for capp_name, buckets in fingerprints.items()
+                }
+
+        parents = {}
+        for capp_name in set(v2) | set(v3):
+            before, after = v2.get(capp_name, {}), v3.get(capp_name, {})
+            for bucket in set(before) | set(after):
+                if before.get(bucket) == after.get(bucket):
+                    continue
+                size = max(before.get(bucket, (0,))[0], after.get(bucket, (0,))[0])
+                # A bucket found on one side only differs in every member: no point splitting it
+                one_sided = bucket not in before or bucket not in after
+                if one_sided or size <= leaf_size or depth >= FINGERPRINT_MAX_DEPTH:
+                    leaves.setdefault(capp_name, set()).add(bucket)
+                else:
+                    parents.setdefault(capp_name, set()).add(bucket)
+
+        if not parents:
+            break
+        logger.info(
+            f"Refining {sum(len(buckets) for buckets in parents.values())} differing bucket(s) "
+            f"of {len(parents)} application(s) to depth {depth + 1}"
+        )
+        depth += 1
+
+    logger.info(
+        f"Object sets differ for {len(leaves)} application(s) in "
+        f"{sum(len(buckets) for buckets in leaves.values())} bucket(s)"
+    )
+
+    members = {environment: {} for environment in endpoints}
+    for environment, driver, db in _tenants(endpoints):
+        applications = tenant_applications[environment, db]
+        if not any(capp_name in leaves for _, capp_name in applications):
+            continue
+        with driver.session(database=db) as session:
+            keys = _run_plan(session, db, _members_plan(applications, key_property, leaves))
+        for app_name, capp_name in applications:
+            members[environment].setdefault(capp_name, Counter()).update(keys.get(app_name, []))
+
+    result = {}
+    for capp_name in sorted(set(totals["V2"]) | set(totals["V3"]), key=str):
+        before = members["V2"].get(capp_name, Counter())
+        after = members["V3"].get(capp_name, Counter())
+        result[capp_name] = {
+            "V2": totals["V2"].get(capp_name, 0),
+            "V3": totals["V3"].get(capp_name, 0),
+            "buckets": len(leaves.get(capp_name, ())),
+            "added": sorted((after - before).elements()),
+            "removed": sorted((before - after).elements()),
+        }
+
+    logger.info("Neo4j object set comparison completed")
+    return result
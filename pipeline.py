@@ -0,0 +1,84 @@
+import queue
+import threading
+import time
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+
+class PipelineStats:
+    """Time each stage spent blocked on the other."""
+
+    def __init__(self):
+        self.items = 0
+        self.producer_wait = 0.0
+        self.consumer_wait = 0.0
+        self.max_depth = 0
+
+    def summary(self, name):
+        return (
+            f"{name} pipeline: {self.items} item(s), collectors waited {self.producer_wait:.2f}s "
+            f"on a full queue, writer waited {self.consumer_wait:.2f}s for results, "
+            f"max queue depth {self.max_depth}"
+        )
+
+
+def pipelined(items, maxsize, stats=None):
+    """Iterate `items` on a producer thread, handing them over through a bounded queue.
+
+    The caller's loop body becomes the single consumer stage. A full queue
+    blocks the producer (backpressure), so at most `maxsize` finished items
+    wait in memory. Exceptions raised by the producer are re-raised here.
+    """
+    stats = stats if stats is not None else PipelineStats()
+    handoff = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    failure = []
+
+    def put(item):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.producer_wait += time.perf_counter() - start
+        stats.max_depth = max(stats.max_depth, handoff.qsize())
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                put(item)
+        except BaseException as exc:
+            failure.append(exc)
+        finally:
+            # Runs the generator's own cleanup on this thread
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, name="collector", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            start = time.perf_counter()
+            item = handoff.get()
+            stats.consumer_wait += time.perf_counter() - start
+            if item is _DONE:
+                break
+            stats.items += 1
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+    if failure:
+        raise failure[0]
@@ -0,0 +1,189 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import Queries
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+SEARCH_PATH_PATTERN = re.compile(r"^\s*set\s+search_path\s+to\s+(\w+)\s*;?", re.IGNORECASE)
+SCHEMA_LAYERS = ("central", "local", "mngt")
+PLACEHOLDER_PATTERN = re.compile(r"\{\w+\}")
+
+
+def _query_names():
+    names = {}
+    templates = []
+    for name, value in vars(Queries).items():
+        if name.startswith("_") or not isinstance(value, str):
+            continue
+        if PLACEHOLDER_PATTERN.search(value):
+            # {schema} prefixes and the snapshot ids of audit variants
+            pattern = re.escape(value.strip())
+            pattern = re.sub(r"\\\{\w+\\\}", lambda _: r"\w+", pattern)
+            templates.append((re.compile(pattern), name))
+        else:
+            names[value.strip()] = name
+    return names, templates
+
+
+QUERY_NAMES, QUERY_TEMPLATES = _query_names()
+
+
+def query_name(query):
+    """Map executed SQL back to its Queries.py identifier."""
+    text = str(query).strip()
+    if text in QUERY_NAMES:
+        return QUERY_NAMES[text]
+
+    match = SEARCH_PATH_PATTERN.match(text)
+    if match:
+        rest = text[match.end():].strip()
+        return query_name(rest) if rest else "set_search_path"
+
+    for pattern, name in QUERY_TEMPLATES:
+        if pattern.fullmatch(text):
+            return name
+    if "UNION ALL" in text and "AS owner" in text:
+        return "bulk_collection"
+    return " ".join(text.split())[:60]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class QueryProfiler:
+    """Collects per-query timings for one validation pass.
+
+    Disabled by default; switch it on with PROFILE_QUERIES=true in
+    config.properties. When disabled every hook is a no-op.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+            self.phases = {}
+            self.started = time.perf_counter()
+
+    # ---- context ----
+    @contextmanager
+    def app(self, app_name):
+        previous = getattr(self._local, "app", None)
+        self._local.app = app_name
+        try:
+            yield
+        finally:
+            self._local.app = previous
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    # ---- recording ----
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record(self, name, phase, schema, rows, seconds, nbytes):
+        record = {
+            "query": name,
+            "phase": phase,
+            "schema": schema,
+            "app": getattr(self._local, "app", None),
+            "rows": rows,
+            "seconds": seconds,
+            # Approximate: text length of the fetched values
+            "bytes": nbytes,
+        }
+        with self._lock:
+            self.records.append(record)
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def run_cypher(self, session, database, name, query, params=None):
+        """Run a Cypher query and return its records as a list."""
+        params = params or {}
+        if not self.enabled:
+            return list(session.run(query, **params))
+
+        start = time.perf_counter()
+        records = list(session.run(query, **params))
+        elapsed = time.perf_counter() - start
+        nbytes = sum(len(str(value)) for record in records for value in record.values())
+        self.record(name, "neo4j", database, len(records), elapsed, nbytes)
+        return records
+
+    async def run_cypher_async(self, session, database, name, query, params=None):
+        """Async-driver counterpart of run_cypher."""
+        start = time.perf_counter()
+        result = await session.run(query, **(params or {}))
+        records = [record async for record in result]
+        if self.enabled:
+            elapsed = time.perf_counter() - start
+            nbytes = sum(len(str(value)) for record in records for value in record.values())
+            self.record(name, "neo4j", database, len(records), elapsed, nbytes)
+        return records
+
+    # ---- reporting ----
+    def summary(self):
+        with self._lock:
+            records = list(self.records)
+            phases = dict(self.phases)
+            wall = time.perf_counter() - self.started
+
+        queries = {}
+        for record in records:
+            queries.setdefault(record["query"], []).append(record)
+
+        per_query = {}
+        for name, items in sorted(queries.items()):
+            latencies = [item["seconds"] * 1000 for item in items]
+            per_query[name] = {
+                "count": len(items),
+                "p50_ms": round(_percentile(latencies, 0.50), 3),
+                "p95_ms": round(_percentile(latencies, 0.95), 3),
+                "max_ms": round(max(latencies), 3),
+                "total_ms": round(sum(latencies), 3),
+                "rows": sum(item["rows"] or 0 for item in items),
+                "bytes": sum(item["bytes"] or 0 for item in items),
+            }
+
+        per_app = {}
+        for record in records:
+            if record["app"] is not None:
+                per_app[record["app"]] = per_app.get(record["app"], 0.0) + record["seconds"]
+        slowest = sorted(per_app.items(), key=lambda item: item[1], reverse=True)[:10]
+
+        return {
+            "wall_seconds": round(wall, 3),
+            "phases_seconds": {name: round(seconds, 3) for name, seconds in sorted(phases.items())},
+            "queries": per_query,
+            "slowest_apps": [{"app": app, "seconds": round(seconds, 3)} for app, seconds in slowest],
+        }
+
+    def write(self, path):
+        if not self.enabled:
+            return
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        logger.info(f"Query profile written to {path}")
+
+
+profiler = QueryProfiler()
@@ -0,0 +1,68 @@
+import time
+
+import psycopg2.extensions
+
+from profiler import SCHEMA_LAYERS, SEARCH_PATH_PATTERN, profiler, query_name
+
+
+class ProfilingCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor that reports every statement (execute + fetch) to the profiler."""
+
+    def execute(self, query, vars=None):
+        self._flush_pending()
+        text = query if isinstance(query, str) else query.decode()
+        match = SEARCH_PATH_PATTERN.match(text)
+        if match:
+            self._search_path = match.group(1)
+
+        start = time.perf_counter()
+        result = super().execute(query, vars)
+        self._pending = (text, time.perf_counter() - start)
+        return result
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._complete(rows, time.perf_counter() - start)
+        return rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._complete([row] if row is not None else [], time.perf_counter() - start)
+        return row
+
+    def close(self):
+        self._flush_pending()
+        super().close()
+
+    def _flush_pending(self):
+        if getattr(self, "_pending", None):
+            self._complete(None, 0.0)
+
+    def _complete(self, rows, fetch_seconds):
+        pending = getattr(self, "_pending", None)
+        if pending is None:
+            return
+        self._pending = None
+        text, execute_seconds = pending
+
+        name = query_name(text)
+        search_path = getattr(self, "_search_path", None) or ""
+        schema, _, layer = search_path.rpartition("_")
+        if name == "set_search_path":
+            phase = "postgres_other"
+        elif layer in SCHEMA_LAYERS and name not in ("loc", "loc_null", "application_inventory"):
+            phase = layer
+        elif name == "bulk_collection":
+            phase = "bulk"
+        else:
+            phase = "aip_node"
+            schema = None
+
+        nbytes = sum(len(str(value)) for row in rows for value in row) if rows else 0
+        profiler.record(
+            name, phase, schema or None,
+            len(rows) if rows is not None else 0,
+            execute_seconds + fetch_seconds, nbytes
+        )
@@ -0,0 +1,203 @@
+import json
+import os
+import statistics
+
+from logger import get_logger
+from Queries import (
+    loc_per_tech_join, critical_violations_snapshot,
+    missing_code_strpos, latest_snapshot
+)
+
+logger = get_logger(__name__)
+
+ORIGINAL = "original"
+
+# Alternative, semantically equivalent forms per Queries.py query name
+QUERY_VARIANTS = {
+    "loc_per_tech": {"join": loc_per_tech_join},
+    "critical_violations": {"snapshot": critical_violations_snapshot},
+    "missing_code": {"strpos": missing_code_strpos},
+}
+
+# Inline forms of the snapshot placeholders, for statements that cannot resolve them first
+SNAPSHOT_SUBQUERIES = {
+    "adg_snapshot": "(SELECT MAX(snapshot_id) FROM adg_delta_snapshots WHERE latest = 1)",
+    "dss_snapshot": "(SELECT MAX(snapshot_id) FROM dss_snapshots)",
+}
+
+
+def needs_snapshots(query):
+    return any("{" + name + "}" in query for name in SNAPSHOT_SUBQUERIES)
+
+
+def render_query(query, snapshots=None):
+    """Fill the snapshot placeholders of a variant.
+
+    snapshots is the (adg, dss) pair returned by Queries.latest_snapshot; without
+    it the placeholders become scalar sub-queries.
+    """
+    if not needs_snapshots(query):
+        return query
+    if snapshots is None:
+        return query.format(**SNAPSHOT_SUBQUERIES)
+
+    adg, dss = snapshots
+    return query.format(
+        adg_snapshot="NULL" if adg is None else int(adg),
+        dss_snapshot="NULL" if dss is None else int(dss),
+    )
+
+
+def load_query_variants(path):
+    """Return {query name: variant text} for the variants selected in `path`."""
+    if not path or not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        selection = json.load(f)
+
+    queries = {}
+    for name, variant in selection.items():
+        if variant == ORIGINAL:
+            continue
+        if variant not in QUERY_VARIANTS.get(name, {}):
+            logger.warning(f"Unknown query variant '{variant}' for '{name}' in {path}, ignored")
+            continue
+        queries[name] = QUERY_VARIANTS[name][variant]
+
+    if queries:
+        logger.info(f"Query variants in use: {', '.join(f'{n}={selection[n]}' for n in queries)}")
+    return queries
+
+# ------------------ PLAN ANALYSIS ------------------
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def plan_summary(plan, seq_scan_rows):
+    """Timings, buffers and large sequential scans of one EXPLAIN (FORMAT JSON) plan."""
+    root = plan["Plan"]
+    seq_scans = []
+
+    for node in _walk(root):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * node.get("Actual Loops", 1)
+        if scanned >= seq_scan_rows:
+            seq_scans.append({
+                "relation": f"{node.get('Schema', '')}.{node.get('Relation Name', '')}".lstrip("."),
+                "rows_scanned": scanned,
+                "filter": node.get("Filter"),
+            })
+
+    return {
+        "planning_ms": plan.get("Planning Time", 0.0),
+        "execution_ms": plan.get("Execution Time", 0.0),
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+        "rows": root.get("Actual Rows", 0),
+        "seq_scans": seq_scans,
+    }
+
+
+def explain(cursor, schema, query, seq_scan_rows):
+    cursor.execute(
+        f"SET search_path TO {schema}; EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {query}"
+    )
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    summary = plan_summary(plan[0], seq_scan_rows)
+    summary["plan"] = plan[0]["Plan"]
+    return summary
+
+
+def _result(cursor, schema, query):
+    cursor.execute(f"SET search_path TO {schema}; {query}")
+    # Row order is not part of the contract; DISTINCT plans may return any order
+    return sorted(cursor.fetchall(), key=repr)
+
+# ------------------ AUDIT ------------------
+def audit_queries(cursor, prefixes, schema_queries, repeat=3, seq_scan_rows=100000, min_gain=0.1):
+    """EXPLAIN (ANALYZE, BUFFERS) every query and variant on each schema prefix.
+
+    schema_queries is [(name, schema suffix, query)]. A variant is selected
+    when it returns the same rows as the original on every sampled schema and
+    its total median execution time is at least `min_gain` lower.
+    """
+    report = {"schemas": list(prefixes), "queries": {}}
+
+    snapshots = {}
+    for prefix in prefixes:
+        cursor.execute(latest_snapshot.format(schema=prefix))
+        snapshots[prefix] = cursor.fetchone()
+
+    for name, suffix, original in schema_queries:
+        variants = {ORIGINAL: original, **QUERY_VARIANTS.get(name, {})}
+        entry = {"variants": {}, "selected": ORIGINAL}
+        report["queries"][name] = entry
+        expected = {}
+
+        for variant, template in variants.items():
+            measured = {"schemas": {}, "total_ms": 0.0, "matches_original": True}
+            entry["variants"][variant] = measured
+
+            for prefix in prefixes:
+                schema = f"{prefix}_{suffix}"
+                query = render_query(template, snapshots[prefix])
+
+                try:
+                    runs = [explain(cursor, schema, query, seq_scan_rows) for _ in range(max(1, repeat))]
+                    rows = _result(cursor, schema, query)
+                except Exception as exc:
+                    cursor.connection.rollback()
+                    logger.warning(f"[Schema={schema}] {name}/{variant} failed: {exc}")
+                    measured["schemas"][schema] = {"error": str(exc)}
+                    measured["matches_original"] = False
+                    continue
+
+                result = dict(runs[-1])
+                result["execution_ms"] = statistics.median(run["execution_ms"] for run in runs)
+                result["planning_ms"] = statistics.median(run["planning_ms"] for run in runs)
+                measured["schemas"][schema] = result
+                measured["total_ms"] += result["execution_ms"]
+
+                for scan in result["seq_scans"]:
+                    logger.warning(
+                        f"[Schema={schema}] {name}/{variant}: sequential scan of "
+                        f"{scan['relation']} over {scan['rows_scanned']} rows"
+                    )
+
+                if variant == ORIGINAL:
+                    expected[prefix] = rows
+                elif rows != expected.get(prefix):
+                    measured["matches_original"] = False
+
+            logger.info(f"{name}/{variant}: {measured['total_ms']:.1f} ms over {len(prefixes)} schema(s)")
+
+        baseline = entry["variants"][ORIGINAL]["total_ms"]
+        candidates = [
+            (measured["total_ms"], variant)
+            for variant, measured in entry["variants"].items()
+            if variant != ORIGINAL
+            and measured["matches_original"]
+            and measured["total_ms"] <= baseline * (1 - min_gain)
+        ]
+        if candidates:
+            entry["selected"] = min(candidates)[1]
+            logger.info(f"{name}: variant '{entry['selected']}' selected over the original")
+
+    return report
+
+
+def write_audit(report, report_path, variants_path):
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    logger.info(f"Query audit report written to {report_path}")
+
+    selection = {name: entry["selected"] for name, entry in report["queries"].items()}
+    with open(variants_path, "w") as f:
+        json.dump(selection, f, indent=2)
+    logger.info(f"Query variant selection written to {variants_path}")
@@ -0,0 +1,78 @@
+import json
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def json_default(value):
+    # psycopg2 returns NUMERIC columns as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+class SnapshotStore:
+    """Local SQLite store of collected application metrics.
+
+    An entry is only served back while the application's snapshot id is
+    unchanged, so a new analysis in CSS always triggers a fresh collection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS app_metrics (
+                environment TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                app TEXT NOT NULL,
+                schema TEXT NOT NULL,
+                snapshot_id TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                total_object_count INTEGER NOT NULL,
+                collected_at TEXT NOT NULL,
+                PRIMARY KEY (environment, domain, app, schema)
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, environment, domain, app, schema, snapshot_id):
+        row = None
+        if snapshot_id is not None:
+            row = self.connection.execute(
+                """SELECT metrics, total_object_count FROM app_metrics
+                WHERE environment = ? AND domain = ? AND app = ? AND schema = ?
+                AND snapshot_id = ?""",
+                (environment, domain, app, schema, snapshot_id)
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def put(self, environment, domain, app, schema, snapshot_id, metrics, total_object_count):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO app_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                environment, domain, app, schema, snapshot_id,
+                json.dumps(metrics, default=json_default),
+                int(total_object_count),
+                datetime.now().isoformat(timespec="seconds")
+            )
+        )
+        self.connection.commit()
+
+    def close(self):
+        logger.info(
+            f"Snapshot store {self.path}: {self.hits} hit(s), {self.misses} miss(es)"
+        )
+        self.connection.close()
@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metric_records import UNMATCHED_COLUMNS, MetricTable, join_v3, unmatched_rows  # noqa: E402
+
+
+def _table(rows, side):
+    """MetricTable from (sheet, app, parameter, value) rows on one side."""
+    table = MetricTable()
+    for sheet, app_name, parameter, value in rows:
+        table.sheets.append(sheet)
+        table.apps.append(app_name)
+        table.parameters.append(parameter)
+        table.v2.append(value if side == "V2" else None)
+        table.v3.append(value if side == "V3" else None)
+        table.variation.append(None)
+        table.extras.append(None)
+    return table
+
+
+def test_join_matches_by_key_not_position():
+    table = _table([
+        ("d1", "a", "Loc", 10),
+        ("d1", "a", "Dlms", 1),
+        ("d1", "b", "Loc", 20),
+    ], "V2")
+    v3_table = _table([
+        ("d1", "c", "Loc", 40),
+        ("d1", "a", "Dlms", 2),
+        ("d1", "a", "Loc", 11),
+    ], "V3")
+
+    matched, v2_only, v3_only = join_v3(table, v3_table)
+
+    assert matched == 2
+    assert table.v3 == [11, 2, None]
+    assert v2_only == [2]
+    assert v3_only == [0]
+    assert unmatched_rows(table, v2_only, v3_table, v3_only) == [
+        UNMATCHED_COLUMNS,
+        ["V2 only", "d1", "b", "Loc", 20],
+        ["V3 only", "d1", "c", "Loc", 40],
+    ]
+
+
+def test_same_app_name_on_two_sheets_is_two_keys():
+    table = _table([("d1", "a", "Loc", 10), ("d2", "a", "Loc", 30)], "V2")
+    v3_table = _table([("d2", "a", "Loc", 31)], "V3")
+
+    matched, v2_only, v3_only = join_v3(table, v3_table)
+
+    assert matched == 1
+    assert table.v3 == [None, 31]
+    assert v2_only == [0]
+    assert v3_only == []
+
+
+def test_duplicate_parameters_within_one_app():
+    # A parameter listed twice: every V2 row gets the last V3 value of its key
+    table = _table([("d1", "a", "Loc", 10), ("d1", "a", "Loc", 12)], "V2")
+    v3_table = _table([("d1", "a", "Loc", 20), ("d1", "a", "Loc", 21)], "V3")
+
+    matched, v2_only, v3_only = join_v3(table, v3_table)
+
+    assert matched == 1
+    assert table.v3 == [21, 21]
+    assert v2_only == []
+    assert v3_only == []
+
+
+def test_nothing_to_match():
+    table = _table([("d1", "a", "Loc", 10)], "V2")
+    v3_table = _table([], "V3")
+
+    matched, v2_only, v3_only = join_v3(table, v3_table)
+
+    assert (matched, v2_only, v3_only) == (0, [0], [])
+    assert table.v3 == [None]
+    assert unmatched_rows(table, v2_only, v3_table, v3_only)[1:] == [["V2 only", "d1", "a", "Loc", 10]]
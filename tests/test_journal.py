@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+import LM_Validation  # noqa: E402
+from journal import RunJournal  # noqa: E402
+
+
+def _append(journal, environment, app_name, total=1):
+    journal.append(environment, "default", app_name, "s", {"loc": [[total]]}, total)
+
+
+def _apps(journal, environment):
+    return sorted(app_name for _, app_name, _ in journal.resume(environment))
+
+
+def test_resume_after_interrupted_v2(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.start("V2")
+    _append(journal, "V2", "a")
+    _append(journal, "V2", "b", 7)
+    journal.close()
+
+    resumed = RunJournal(journal.path)
+    assert _apps(resumed, "V2") == ["a", "b"]
+    assert resumed.resume("V2")[("default", "b", "s")] == ({"loc": [[7]]}, 7)
+    assert resumed.resume("V3") == {}
+
+
+def test_resume_after_interrupted_v3(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.start("V2")
+    _append(journal, "V2", "a")
+    _append(journal, "V2", "b")
+    journal.start("V3")
+    _append(journal, "V3", "a")
+    journal.close()
+
+    resumed = RunJournal(journal.path)
+    # The V2 pass stays complete; V3 carries on after its own start marker
+    assert _apps(resumed, "V2") == ["a", "b"]
+    assert _apps(resumed, "V3") == ["a"]
+
+
+def test_new_v3_start_discards_earlier_v3_entries(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.start("V2")
+    _append(journal, "V2", "a")
+    journal.start("V3")
+    _append(journal, "V3", "a")
+    journal.start("V3")
+
+    assert _apps(journal, "V2") == ["a"]
+    assert _apps(journal, "V3") == []
+    journal.close()
+
+
+def test_v2_start_truncates_the_journal(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.start("V2", (1, 3))
+    _append(journal, "V2", "a")
+    journal.start("V3", (1, 3))
+    _append(journal, "V3", "a")
+    journal.start("V2")
+    journal.close()
+
+    with open(journal.path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+    assert journal.resume("V2") == {}
+    assert journal.resume("V3") == {}
+    assert journal.shard() is None
+
+
+def test_shard_of_the_last_start(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.start("V2", (2, 3))
+    _append(journal, "V2", "a")
+    journal.start("V3", (2, 3))
+    journal.close()
+
+    assert journal.shard() == (2, 3)
+
+
+def test_cli_all_resumes_both_passes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(LM_Validation, "generate_report", lambda jobs, force, resume, run: calls.append(("V2", resume)))
+    monkeypatch.setattr(LM_Validation, "generate_report3", lambda jobs, force, resume, run: calls.append(("V3", resume)))
+    monkeypatch.setattr(LM_Validation, "calculate_variation_only_clean", lambda path: None)
+
+    assert cli.main(["all", "--resume"]) == 0
+    assert calls == [("V2", True), ("V3", True)]
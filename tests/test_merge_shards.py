@@ -0,0 +1,59 @@
+import os
+import sys
+
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LM_Validation  # noqa: E402
+from journal import RunJournal  # noqa: E402
+
+
+def _metrics(loc):
+    return {
+        "loc": [[loc]],
+        "loc_per_tech": [["Java", loc]],
+        "extension_count": [[3]],
+        "dlms": [[0]],
+        "missing_code_db": [[0]],
+        "analyzed_files": [[10]],
+        "missing_code": [[0]],
+        "critical_violations": [[None, None, 2]],
+        "customized_jobs": [[0]],
+    }
+
+
+def _shard(path, shard, apps):
+    journal = RunJournal(path)
+    for environment in ("V2", "V3"):
+        journal.start(environment, shard)
+        for position, (app_name, environments) in apps.items():
+            if environment in environments:
+                journal.append(environment, "default", app_name, "s", _metrics(100), 50, position=position)
+    journal.close()
+
+
+def _loc_rows(path):
+    ws = load_workbook(path)["default"]
+    return {
+        row[0].value: (row[3].value, row[4].value, row[4].fill.fgColor.rgb if row[4].fill.fill_type else None)
+        for row in ws.iter_rows(min_row=2)
+        if row[1].value == "Loc"
+    }
+
+
+def test_merge_reports_v2_only_app_like_the_full_run(tmp_path):
+    """An application missing from V3 gets -100, highlighted, and a second variation pass agrees."""
+    first, second = str(tmp_path / "shard_1.jsonl"), str(tmp_path / "shard_2.jsonl")
+    _shard(first, (1, 2), {0: ("both", ("V2", "V3"))})
+    _shard(second, (2, 2), {1: ("v2_only", ("V2",))})
+    workbook = str(tmp_path / "validation.xlsx")
+
+    LM_Validation.merge_shards([first, second], workbook)
+
+    merged = _loc_rows(workbook)
+    assert merged["both"] == (100, 0, None)
+    assert merged["v2_only"] == (None, -100, "00FF0000")
+
+    LM_Validation.calculate_variation_only_clean(workbook)
+    assert _loc_rows(workbook) == merged
@@ -0,0 +1,25 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_neo4j import FakeNeo4jDriver  # noqa: E402
+from neo4j_counts import build_app_count_query, fetch_neo4j_object_counts  # noqa: E402
+
+NAMES = ["plain", "with space", "dash-ed", "back`tick"]
+
+
+def test_app_count_query_quotes_the_label():
+    assert "MATCH (o:Object:`back``tick`)" in build_app_count_query("back`tick")
+    assert "MATCH (o:Object:`with space`)" in build_app_count_query("with space")
+
+
+def test_per_app_and_batched_counts_agree_on_unusual_names():
+    driver = FakeNeo4jDriver({"t": {name: (name.upper(), 10 + i) for i, name in enumerate(NAMES)}})
+
+    per_app = fetch_neo4j_object_counts(driver, ["t"], batch_size=0)
+    batched = fetch_neo4j_object_counts(driver, ["t"], batch_size=100)
+
+    assert per_app == batched == {name.upper(): 10 + i for i, name in enumerate(NAMES)}
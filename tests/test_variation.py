@@ -0,0 +1,93 @@
+import os
+import sys
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LM_Validation  # noqa: E402
+from metric_records import REPORT_COLUMNS  # noqa: E402
+
+
+def _workbook(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "default"
+    ws.append(REPORT_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _variation(path):
+    ws = load_workbook(path)["default"]
+    return {row[1]: row[4] for row in ws.iter_rows(min_row=2, values_only=True)}
+
+
+@pytest.mark.parametrize("loc_per_tech", [None, ""])
+def test_variation_without_breakdown_strings(tmp_path, loc_per_tech):
+    """No V2 cell is a string: the breakdown check must not use the .str accessor."""
+    path = str(tmp_path / "validation.xlsx")
+    _workbook(path, [
+        ["app", "Loc", 100, 90, None],
+        [None, "Loc Per Tech", loc_per_tech, loc_per_tech, None],
+        [None, "Extension Count", 3, 3, None],
+    ])
+
+    LM_Validation.calculate_variation_only_clean(path)
+
+    variation = _variation(path)
+    assert variation["Loc"] == -10
+    assert variation["Extension Count"] == 0
+
+
+def test_variation_with_breakdown_strings(tmp_path):
+    path = str(tmp_path / "validation.xlsx")
+    _workbook(path, [
+        ["app", "Loc", 100, 90, None],
+        [None, "Loc Per Tech", "Java:10", "Java:7", None],
+    ])
+
+    LM_Validation.calculate_variation_only_clean(path)
+
+    variation = _variation(path)
+    assert variation["Loc"] == -10
+    assert variation["Loc Per Tech"] == "Java:3"
+
+
+@pytest.mark.parametrize("v3", [None, 0])
+def test_variation_without_v3_breakdowns(tmp_path, v3):
+    """V2-only workbook (V3 read back as None) or V3 breakdowns collapsed to 0: no variation."""
+    path = str(tmp_path / "validation.xlsx")
+    _workbook(path, [
+        ["app", "Loc", 100, v3, None],
+        [None, "Loc Per Tech", "Java:10", v3, None],
+        ["other", "Loc Per Tech", "SQL:5, Java:1", v3, None],
+    ])
+
+    LM_Validation.calculate_variation_only_clean(path)
+
+    ws = load_workbook(path)["default"]
+    variation = [row[4] for row in ws.iter_rows(min_row=2, values_only=True)]
+    assert variation[1:] == [None, None]
+
+
+def test_variation_keeps_user_columns_and_sheet_order(tmp_path):
+    path = str(tmp_path / "validation.xlsx")
+    wb = Workbook()
+    notes = wb.active
+    notes.title = "Notes"
+    notes.append(["free text"])
+    ws = wb.create_sheet("default")
+    ws.append(REPORT_COLUMNS + ["Comments"])
+    ws.append(["app", "Loc", 100, 90, None, "checked by QA"])
+    wb.save(path)
+
+    LM_Validation.calculate_variation_only_clean(path)
+
+    wb = load_workbook(path)
+    assert wb.sheetnames == ["Notes", "default"]
+    assert [c.value for c in wb["Notes"][1]] == ["free text"]
+    assert [c.value for c in wb["default"][1]] == REPORT_COLUMNS + ["Comments"]
+    assert [c.value for c in wb["default"][2]] == ["app", "Loc", 100, 90, -10, "checked by QA"]